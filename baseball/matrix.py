@@ -0,0 +1,355 @@
+import numpy as np
+
+
+# play counters copied directly from a parsed play, one int8 column each
+play_flags = (
+    # direct play codes
+    'balk', 'batter_out', 'catcher_interference', 'defensive_indifference', 'double',
+    'dropped_third_strike', 'error_batter_on_base', 'error_on_foul_fly_ball', 'fielders_choice',
+    'ground_rule_double', 'home_run', 'hit_by_pitch', 'intentional_walk', 'no_play', 'other_advance',
+    'passed_ball', 'single', 'strike_out', 'triple', 'unknown', 'walk', 'wild_pitch',
+
+    # modifier codes
+    'bunt_grounder', 'bunt_pop_up', 'double_play', 'fly_ball', 'force_out', 'ground_ball',
+    'ground_double_play', 'ground_triple_play', 'line_double_play', 'line_drive', 'line_triple_play',
+    'pop_up', 'sacrifice_fly', 'sacrifice_hit', 'triple_play',
+
+    # derived statistics
+    'num_out', 'num_run', 'run_batted_in', 'earned_run',
+)
+
+# position and base codes are counted rather than listed
+# put_out, assist and error are indexed by fielding position 1-9
+# score, stolen_base, caught_stealing and pick_off are indexed by the base the runner started on, 1-3
+# i.e. SB2 is counted at index 1 for the runner on first, and 0 is unused
+# advance counts 1-2, 1-3 and 2-3
+play_dtype = np.dtype([(name, np.int8) for name in play_flags] + [
+    ('put_out', np.uint8, (10,)),
+    ('assist', np.uint8, (10,)),
+    ('error', np.uint8, (10,)),
+    ('score', np.uint8, (4,)),
+    ('stolen_base', np.uint8, (4,)),
+    ('caught_stealing', np.uint8, (4,)),
+    ('pick_off', np.uint8, (4,)),
+    ('num_pick_off', np.uint8),
+    ('advance', np.uint8, (3,)),
+])
+
+# one row per event, players are interned to integer indices, -1 for an empty base
+# runner and fielder are indexed the same way as the base and position codes above
+event_dtype = np.dtype([
+    ('game', np.int32),
+    ('visitor_or_home', np.int8),
+    ('batter', np.int32),
+    ('runner', np.int32, (4,)),
+    ('fielder', np.int32, (10,)),
+] + [(name, play_dtype.fields[name][0]) for name in play_dtype.names])
+
+position_index = {str(position): position for position in range(1, 10)}
+base_index = {'1': 1, '2': 2, '3': 3}
+
+# stolen and caught stealing bases are credited to the runner starting on the previous base
+steal_index = {'2': 1, '3': 2, 'H': 3, '4': 3}
+
+advance_index = {'1-2': 0, '1-3': 1, '2-3': 2}
+
+runner_labels = ('runner_1b', 'runner_2b', 'runner_3b')
+fielder_labels = (
+    'pitcherID',
+    'field_C_playerID',
+    'field_1B_playerID',
+    'field_2B_playerID',
+    'field_3B_playerID',
+    'field_SS_playerID',
+    'field_LF_playerID',
+    'field_CF_playerID',
+    'field_RF_playerID',
+)
+
+
+def count_codes(codes, index, size):
+    result = [0] * size
+    for code in codes:
+        if code in index:
+            result[index[code]] += 1
+    return result
+
+
+def play_row(parsed_play):
+    row = [getattr(parsed_play, name) for name in play_flags]
+    row.append(count_codes(parsed_play.put_out, position_index, 10))
+    row.append(count_codes(parsed_play.assist, position_index, 10))
+    row.append(count_codes(parsed_play.error, position_index, 10))
+    row.append(count_codes(parsed_play.score, base_index, 4))
+    row.append(count_codes(parsed_play.stolen_base, steal_index, 4))
+    row.append(count_codes(parsed_play.caught_stealing, steal_index, 4))
+    row.append(count_codes(parsed_play.pick_off, base_index, 4))
+    row.append(len(parsed_play.pick_off))
+    row.append(count_codes(parsed_play.advance, advance_index, 3))
+    return tuple(row)
+
+
+class EventMatrix:
+    def __init__(self, play_cache):
+        self.play_cache = play_cache
+
+        # each distinct play is converted to a row once, events refer to it by index
+        self.play_index = {}
+        self.play_rows = []
+
+        self.player_index = {}
+        self.game_ids = []
+
+        # columns collected while streaming events
+        self.plays = []
+        self.games = []
+        self.sides = []
+        self.batters = []
+        self.runners = []
+        self.fielders = []
+
+    def player_ids(self):
+        return list(self.player_index)
+
+    def intern(self, player_id):
+        return self.player_index.setdefault(player_id, len(self.player_index))
+
+    def append_game(self, game_id):
+        self.game_ids.append(game_id)
+
+    def append(self, event):
+        key = (event['theplay'], event['baserunning'])
+        play = self.play_index.get(key)
+        if play is None:
+            play = len(self.play_rows)
+            self.play_index[key] = play
+            self.play_rows.append(play_row(self.play_cache.parse(*key)))
+        self.plays.append(play)
+
+        self.games.append(len(self.game_ids) - 1)
+        self.sides.append(int(event['visitor_or_home']))
+        self.batters.append(self.intern(event['batterID']))
+
+        for label in runner_labels:
+            runner_id = event[label]
+            self.runners.append(self.intern(runner_id) if runner_id != '' else -1)
+
+        for label in fielder_labels:
+            self.fielders.append(self.intern(event[label]))
+
+    def build(self):
+        num_event = len(self.plays)
+        events = np.zeros(num_event, dtype=event_dtype)
+        events['game'] = self.games
+        events['visitor_or_home'] = self.sides
+        events['batter'] = self.batters
+        events['runner'][:, 0] = -1
+        events['runner'][:, 1:] = np.array(self.runners, dtype=np.int32).reshape(num_event, 3)
+        events['fielder'][:, 0] = -1
+        events['fielder'][:, 1:] = np.array(self.fielders, dtype=np.int32).reshape(num_event, 9)
+
+        # gather the play columns from the distinct plays
+        plays = np.array(self.play_rows, dtype=play_dtype)
+        play = np.array(self.plays, dtype=np.int64)
+        for name in play_dtype.names:
+            events[name] = plays[name][play]
+        return events
+
+
+def game_scores(events, num_game):
+    visitor_batting = events['visitor_or_home'] == 0
+    vis_score = np.bincount(events['game'][visitor_batting], weights=events['num_run'][visitor_batting],
+                            minlength=num_game)
+    home_score = np.bincount(events['game'][~visitor_batting], weights=events['num_run'][~visitor_batting],
+                             minlength=num_game)
+    return vis_score.astype(np.int64), home_score.astype(np.int64)
+
+
+def batting_counts(events):
+    # sacrifices don't count as outs for at bats
+    sacrifice = (events['sacrifice_hit'] != 0) | (events['sacrifice_fly'] != 0)
+    return np.stack([
+        events['sacrifice_hit'],
+        events['sacrifice_fly'],
+        np.where(sacrifice, 0, events['batter_out']),
+        events['strike_out'],
+        events['single'],
+        events['double'],
+        events['triple'],
+        events['home_run'],
+        events['hit_by_pitch'],
+        events['error_batter_on_base'],
+        events['walk'],
+        events['intentional_walk'],
+        events['fielders_choice'],
+        events['num_run'],
+        events['run_batted_in'],
+    ], axis=1).astype(np.int64)
+
+
+def base_running_counts(events, runner):
+    result = np.zeros((len(events), 15), dtype=np.int64)
+    if runner == 1:
+        result[:, 0] = events['advance'][:, 0]
+        result[:, 1] = events['advance'][:, 1]
+    elif runner == 2:
+        result[:, 2] = events['advance'][:, 2]
+    # caught stealing, pick off, score and stolen base for the runner's base
+    result[:, 2 + runner] = events['caught_stealing'][:, runner]
+    result[:, 5 + runner] = events['pick_off'][:, runner]
+    result[:, 8 + runner] = events['score'][:, runner]
+    result[:, 11 + runner] = events['stolen_base'][:, runner]
+    return result
+
+
+def fielding_counts(events, position):
+    put_out = events['put_out'][:, position].astype(np.int64)
+    assist = events['assist'][:, position].astype(np.int64)
+    fielded_play = (put_out > 0) | (assist > 0)
+    result = np.zeros((len(events), 7), dtype=np.int64)
+    result[:, 0] = events['num_out']
+    result[:, 1] = put_out
+    result[:, 2] = assist
+    result[:, 3] = events['error'][:, position]
+    result[:, 4] = (events['double_play'] > 0) & fielded_play
+    result[:, 5] = (events['triple_play'] > 0) & fielded_play
+    # only the catcher can miss a passed ball
+    if position == 2:
+        result[:, 6] = events['passed_ball'] > 0
+    return result
+
+
+def pitching_counts(events):
+    return np.stack([
+        events['num_out'],
+        events['strike_out'],
+        events['single'],
+        events['double'],
+        events['triple'],
+        events['home_run'],
+        events['num_run'],
+        events['earned_run'],
+        events['walk'],
+        events['intentional_walk'],
+        events['wild_pitch'],
+        events['hit_by_pitch'],
+        events['balk'],
+        events['num_pick_off'],
+    ], axis=1).astype(np.int64)
+
+
+def ratio(numerator, denominator):
+    # match the stat classes, which leave ratios at zero until the denominator is positive
+    result = np.zeros(len(numerator))
+    valid = denominator > 0
+    result[valid] = numerator[valid] / denominator[valid]
+    return result
+
+
+def batting_features(counts):
+    single, double, triple, home_run = counts[:, 4], counts[:, 5], counts[:, 6], counts[:, 7]
+    hit = single + double + triple + home_run
+    at_bat = counts[:, 3] + counts[:, 2] + hit + counts[:, 9] + counts[:, 12]
+    times_reached_base = hit + counts[:, 10] + counts[:, 8]
+    at_bats_plus = at_bat + counts[:, 10] + counts[:, 8] + counts[:, 1]
+    total_bases = single + 2 * double + 3 * triple + 4 * home_run
+    return np.column_stack([
+        counts,
+        hit,
+        at_bat,
+        ratio(hit, at_bat),
+        times_reached_base,
+        at_bats_plus,
+        ratio(times_reached_base, at_bats_plus),
+        total_bases,
+        ratio(total_bases, at_bat),
+    ])
+
+
+def base_running_features(counts):
+    caught_stealing = counts[:, 3] + counts[:, 4] + counts[:, 5]
+    pick_off = counts[:, 6] + counts[:, 7] + counts[:, 8]
+    score_from_base = counts[:, 9] + counts[:, 10] + counts[:, 11]
+    stolen_base = counts[:, 12] + counts[:, 13] + counts[:, 14]
+    return np.column_stack([
+        counts[:, 0:3],
+        caught_stealing,
+        counts[:, 3:6],
+        pick_off,
+        counts[:, 6:9],
+        score_from_base,
+        counts[:, 9:12],
+        stolen_base,
+        counts[:, 12:15],
+    ])
+
+
+def fielding_features(counts):
+    num_out, put_out, assist, error = counts[:, 0], counts[:, 1], counts[:, 2], counts[:, 3]
+    total_chance = put_out + assist + error
+    return np.column_stack([
+        num_out,
+        total_chance,
+        put_out,
+        assist,
+        error,
+        counts[:, 4:7],
+        num_out / 3.0,
+        ratio(put_out + assist, total_chance),
+    ])
+
+
+def pitching_features(counts):
+    innings_pitched = counts[:, 0] / 3.0
+    hit = counts[:, 2] + counts[:, 3] + counts[:, 4] + counts[:, 5]
+    return np.column_stack([
+        counts,
+        hit,
+        innings_pitched,
+        ratio(counts[:, 7] * 9.0, innings_pitched),
+    ])
+
+
+def player_game_features(events, num_player):
+    # every (game, player) pair seen in any role gets one row of features, same order as Player.features
+    games = events['game'].astype(np.int64)
+    roles = [('batting', None, events['batter'])]
+    for runner in range(1, 4):
+        roles.append(('base_running', runner, events['runner'][:, runner]))
+    for position in range(1, 10):
+        roles.append(('fielding', position, events['fielder'][:, position]))
+    roles.append(('pitching', None, events['fielder'][:, 1]))
+
+    keys = []
+    for _, _, players in roles:
+        present = players >= 0
+        keys.append(games[present] * num_player + players[present])
+    unique_keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    num_pair = len(unique_keys)
+
+    batting = np.zeros((num_pair, 15), dtype=np.int64)
+    base_running = np.zeros((num_pair, 15), dtype=np.int64)
+    fielding = np.zeros((num_pair, 7), dtype=np.int64)
+    pitching = np.zeros((num_pair, 14), dtype=np.int64)
+
+    offset = 0
+    for (role, code, players), key in zip(roles, keys):
+        pair = inverse[offset:offset + len(key)]
+        offset += len(key)
+        present = players >= 0
+        if role == 'batting':
+            np.add.at(batting, pair, batting_counts(events[present]))
+        elif role == 'base_running':
+            np.add.at(base_running, pair, base_running_counts(events[present], code))
+        elif role == 'fielding':
+            np.add.at(fielding, pair, fielding_counts(events[present], code))
+        else:
+            np.add.at(pitching, pair, pitching_counts(events[present]))
+
+    features = np.column_stack([
+        batting_features(batting),
+        base_running_features(base_running),
+        fielding_features(fielding),
+        pitching_features(pitching),
+    ])
+    return unique_keys // num_player, unique_keys % num_player, features
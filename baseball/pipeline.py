@@ -1,29 +1,77 @@
 import csv
+import io
 import sqlite3
 import os
 import time
 import collections
+import concurrent.futures
+import operator
 import numpy as np
-from baseball.player import Play, Player, game_id_to_datetime
+from baseball.player import PlayCache, Player, game_id_to_datetime
+from baseball.matrix import EventMatrix, game_scores, player_game_features
 
 
 class StandardScaler:
     def __init__(self, num_feature=0):
         self.num_feature = num_feature
+        # running mean and sum of squared deviations, more stable than raw power sums for large career totals
         self.count = 0
-        self.sum1 = np.zeros(num_feature)
-        self.sum2 = np.zeros(num_feature)
+        self.mean = np.zeros(num_feature)
+        self.m2 = np.zeros(num_feature)
+
+    @property
+    def sum1(self):
+        return self.mean * self.count
+
+    @property
+    def sum2(self):
+        return self.m2 + self.mean * self.mean * self.count
 
     def update(self, x):
-        x = np.array(x)
-        self.sum1 += x
-        self.sum2 += x * x
+        x = np.asarray(x, dtype=float)
         self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def update_many(self, x):
+        # one sample per row, combined with the running statistics in a single merge
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return
+        batch = StandardScaler(num_feature=self.num_feature)
+        batch.count = len(x)
+        batch.mean = x.mean(axis=0)
+        batch.m2 = ((x - batch.mean) ** 2).sum(axis=0)
+        self.merge(batch)
+
+    def merge(self, other):
+        # combine statistics of disjoint samples, e.g. scalers from separate seasons or workers
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + delta * delta * (self.count * other.count / count)
+        self.count = count
+
+    def state(self):
+        return {
+            'scaler_count': np.array(self.count),
+            'scaler_mean': self.mean,
+            'scaler_m2': self.m2,
+        }
+
+    def restore(self, state):
+        assert len(state['scaler_mean']) == self.num_feature
+        self.count = int(state['scaler_count'])
+        self.mean = state['scaler_mean'].copy()
+        self.m2 = state['scaler_m2'].copy()
 
     def calculate_statistics(self):
         if self.count > 0:
-            mu = self.sum1 / self.count
-            std = np.sqrt(self.sum2 / self.count - mu * mu)
+            mu = self.mean.copy()
+            std = np.sqrt(self.m2 / self.count)
             tol = 1e-8
             invalid = std < tol
             std[invalid] = 1.0
@@ -33,6 +81,67 @@ class StandardScaler:
         return mu, std
 
 
+class PrefixSum:
+    def __init__(self, num_feature=0, capacity=1024):
+        self.num_feature = num_feature
+        # player id -> dense row of the sums array, rows are handed out in order of first appearance
+        self.player_index = {}
+        self.sums = np.zeros((capacity, num_feature))
+
+    def __len__(self):
+        return len(self.player_index)
+
+    def __contains__(self, player_id):
+        return player_id in self.player_index
+
+    def __getitem__(self, player_id):
+        return self.sums[self.player_index[player_id]]
+
+    def rows(self, player_ids):
+        result = []
+        for player_id in player_ids:
+            result.append(self.player_index.setdefault(player_id, len(self.player_index)))
+
+        # double the capacity whenever new players no longer fit
+        capacity = len(self.sums)
+        if len(self.player_index) > capacity:
+            while len(self.player_index) > capacity:
+                capacity *= 2
+            sums = np.zeros((capacity, self.num_feature))
+            sums[:len(self.sums)] = self.sums
+            self.sums = sums
+        return result
+
+    def gather(self, player_ids):
+        # read only, players not seen yet get a row of zeros without being added to the index
+        result = np.zeros((len(player_ids), self.num_feature))
+        known = [(idx, self.player_index[player_id]) for idx, player_id in enumerate(player_ids)
+                 if player_id in self.player_index]
+        if known:
+            idx, rows = zip(*known)
+            result[list(idx)] = self.sums[list(rows)]
+        return result
+
+    def add(self, player_ids, features):
+        # each player appears at most once per game, so a single fancy-index add is safe
+        rows = self.rows(player_ids)
+        self.sums[rows] += features
+
+    def state(self):
+        # player ids in row order alongside only the rows in use
+        return {
+            'prefix_sum_player_ids': np.array(list(self.player_index), dtype=str),
+            'prefix_sum': self.sums[:len(self.player_index)],
+        }
+
+    def restore(self, state):
+        sums = state['prefix_sum']
+        assert sums.shape[1] == self.num_feature
+        self.player_index = {player_id: idx for idx, player_id in enumerate(state['prefix_sum_player_ids'].tolist())}
+        self.sums = np.zeros((max(len(sums), len(self.sums)), self.num_feature))
+        self.sums[:len(sums)] = sums
+
+
 runner_map = {
     '1': 'runner_1b',
     '2': 'runner_2b',
@@ -52,6 +161,49 @@ position_map = {
         }
 
 
+# the only event columns used by transform and the lineup parser
+event_columns = (
+    'gameID',
+    'visteam',
+    'hometeam',
+    'visitor_or_home',
+    'batterID',
+    'theplay',
+    'baserunning',
+    'runner_1b',
+    'runner_2b',
+    'runner_3b',
+    'pitcherID',
+    'field_C_playerID',
+    'field_1B_playerID',
+    'field_2B_playerID',
+    'field_3B_playerID',
+    'field_SS_playerID',
+    'field_LF_playerID',
+    'field_CF_playerID',
+    'field_RF_playerID',
+)
+
+
+class Event(collections.namedtuple('Event', event_columns)):
+    __slots__ = ()
+
+    # columns can be looked up by name, i.e. event['theplay'], just like a csv.DictReader row
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+
+def read_events(csv_file):
+    # find the needed columns once from the header, then keep just those fields from each row
+    reader = csv.reader(csv_file)
+    header = next(reader)
+    columns = operator.itemgetter(*[header.index(column) for column in event_columns])
+    for row in reader:
+        yield Event._make(columns(row))
+
+
 class Lineup:
     def __init__(self, use_dh=False):
         self.use_dh = use_dh
@@ -132,6 +284,29 @@ class LineupParser:
             for pitcher_id in pitchers:
                 self.bullpen[team_key].append(pitcher_id)
 
+    def state(self):
+        # each team's bullpen as a row of pitcher ids padded to num_bullpen, with the number in use
+        team_keys = list(self.bullpen)
+        pitchers = np.full((len(team_keys), self.num_bullpen), '', dtype=object)
+        sizes = np.zeros(len(team_keys), dtype=np.int64)
+        for idx, team_key in enumerate(team_keys):
+            bullpen = list(self.bullpen[team_key])
+            pitchers[idx, :len(bullpen)] = bullpen
+            sizes[idx] = len(bullpen)
+        return {
+            'bullpen_team_keys': np.array(team_keys, dtype=str),
+            'bullpen_pitchers': pitchers.astype(str),
+            'bullpen_sizes': sizes,
+        }
+
+    def restore(self, state):
+        self.bullpen = {}
+        team_keys = state['bullpen_team_keys'].tolist()
+        pitchers = state['bullpen_pitchers'].tolist()
+        sizes = state['bullpen_sizes'].tolist()
+        for team_key, bullpen, size in zip(team_keys, pitchers, sizes):
+            self.bullpen[team_key] = collections.deque(bullpen[:size], maxlen=self.num_bullpen)
+
     def get_bullpen(self, team_key):
         # always return a list of length num_bullpen
         result = [None] * self.num_bullpen
@@ -163,45 +338,93 @@ class LineupParser:
                     self.visitor.fielders[position] = event[position]
             self.visitor.pitchers[pitcher_id] = True
 
-    def fetch(self):
+    def snapshot(self):
+        # everything needed to build the starting lineup that doesn't depend on previous games
         if self.use_dh:
             self.home.find_designated_hitter()
             self.visitor.find_designated_hitter()
 
-        home_lineup = self.home.fetch()
-        visitor_lineup = self.visitor.fetch()
+        visitor_relief = []
+        home_relief = []
+        if self.use_bullpen:
+            visitor_relief = self.visitor.relief_pitchers()
+            home_relief = self.home.relief_pitchers()
+
+        return (
+            self.visitor.team_key,
+            self.visitor.fetch(),
+            visitor_relief,
+            self.home.team_key,
+            self.home.fetch(),
+            home_relief,
+        )
+
+    def resolve(self, snapshot):
+        # bullpens roll over from game to game, so snapshots must be resolved in game order
+        visitor_key, visitor_lineup, visitor_relief, home_key, home_lineup, home_relief = snapshot
 
         if self.use_bullpen:
             # get previous bullpens before updating
-            visitor_bullpen = self.get_bullpen(self.visitor.team_key)
-            home_bullpen = self.get_bullpen(self.home.team_key)
+            visitor_bullpen = self.get_bullpen(visitor_key)
+            home_bullpen = self.get_bullpen(home_key)
             starting_lineup = visitor_lineup + visitor_bullpen + home_lineup + home_bullpen
-            self.update_bullpen(self.home.team_key, self.home.relief_pitchers())
-            self.update_bullpen(self.visitor.team_key, self.visitor.relief_pitchers())
+            self.update_bullpen(home_key, home_relief)
+            self.update_bullpen(visitor_key, visitor_relief)
         else:
             starting_lineup = visitor_lineup + home_lineup
 
         result = {player_id: idx for idx, player_id in enumerate(starting_lineup) if player_id is not None}
         return result
 
+    def fetch(self):
+        return self.resolve(self.snapshot())
+
 
 class Pipeline:
-    def __init__(self, db_name='features', use_dh=False, use_bullpen=False):
+    def __init__(self, db_name='features', use_dh=False, use_bullpen=False, play_cache_size=65536, use_matrix=False,
+                 num_workers=1, blob_features=False, export_arrays=False):
         self.data_path = '../data'
         self.season_path = os.path.join(self.data_path, 'seasons')
         self.db_file = os.path.join(self.data_path, '{}.db'.format(db_name))
-        self.play = Play()
+
+        # the same play strings repeat across seasons, only parse each one once
+        self.play_cache = PlayCache(max_size=play_cache_size)
+
+        # transform whole seasons as an event matrix instead of game by game
+        self.use_matrix = use_matrix
+
+        # extract and transform seasons in worker processes, load stays in this process
+        self.num_workers = num_workers
+        self.worker_args = {
+            'use_dh': use_dh,
+            'use_bullpen': use_bullpen,
+            'play_cache_size': play_cache_size,
+            'use_matrix': use_matrix,
+        }
+
+        # leave starting lineups as snapshots for the load stage to resolve in game order
+        self.defer_lineup = False
 
         self.lo_year = 1914
         self.hi_year = 2022
 
-        # exclusive prefix sum of each player's career stats for each game they play
-        self.prefix_sum = {}
+        # optional single pass split of games into one database per name by inclusive year range, i.e.
+        # {'train': (1914, 2020), 'valid': (2021, 2021), 'test': (2022, 2022)}
+        # career features carry across every season, and the scaler is fitted on fit_split seasons only
+        self.splits = None
+        self.fit_split = 'train'
 
         self.lineup_parser = LineupParser(use_dh=use_dh, use_bullpen=use_bullpen)
         self.num_player = 2 * self.lineup_parser.roster_size()
 
         self.num_feature = len(Player('foo').features())
+
+        # feature columns that are counts, stored as integers rather than reals
+        integer_features = [isinstance(x, int) for x in Player('foo').features()]
+        self.integer_features = np.array(integer_features * self.num_player)
+
+        # exclusive prefix sum of each player's career stats for each game they play
+        self.prefix_sum = PrefixSum(num_feature=self.num_feature)
         self.num_aggregate_feature = self.num_player * self.num_feature
 
         # create new player table listing player x game features
@@ -209,33 +432,69 @@ class Pipeline:
         for idx in range(self.num_aggregate_feature):
             self.feature_header.append('x{:04}'.format(idx))
 
+        # store each game's features as one packed float32 blob instead of a column per feature
+        self.blob_features = blob_features
+
+        # also export each database's games as .npy files next to it for memory mapped training
+        self.export_arrays = export_arrays
+
         self.scaler = StandardScaler(num_feature=self.num_aggregate_feature)
 
     def parse_lineup(self):
         pass
 
-    def extract(self, year):
+    def season_file(self, year):
         if not isinstance(year, int):
             print('year {} is not an int'.format(year))
             return None
         if not (self.lo_year <= year <= self.hi_year):
             print('year {} out of range'.format(year))
             return None
+        return os.path.join(self.season_path, '{}rs.csv'.format(year))
 
-        rs = os.path.join(self.season_path, '{}rs.csv'.format(year))
-        print('  extracting {}'.format(rs))
-        with open(rs) as csv_file:
-            reader = csv.DictReader(csv_file)
-
-            data = {}
-            for event in reader:
-                gameID = event['gameID']
-                if gameID in data:
-                    data[gameID].append(event)
-                else:
-                    data[gameID] = [event]
+    def extract(self, year):
+        rs = self.season_file(year)
+        if rs is None:
+            return None
+
+        data = {}
+        for gameID, game_events in self.extract_games(year):
+            if gameID in data:
+                data[gameID] += game_events
+            else:
+                data[gameID] = game_events
         return data
 
+    def extract_games(self, year):
+        # season files are grouped by game, so yield each game's events as soon as the next game starts
+        # rather than holding the whole season in memory
+        rs = self.season_file(year)
+        if rs is None:
+            return
+
+        print('  extracting {}'.format(rs))
+        with open(rs, newline='') as csv_file:
+            gameID = None
+            game_events = []
+            for event in read_events(csv_file):
+                if event.gameID != gameID:
+                    if game_events:
+                        yield gameID, game_events
+                    gameID = event.gameID
+                    game_events = []
+                game_events.append(event)
+            if game_events:
+                yield gameID, game_events
+
+    def fetch_lineup(self):
+        if self.defer_lineup:
+            return self.lineup_parser.snapshot()
+        return self.lineup_parser.fetch()
+
+    def resolve_lineups(self, game_data):
+        for game_id, (players, game_result, snapshot) in game_data.items():
+            game_data[game_id] = (players, game_result, self.lineup_parser.resolve(snapshot))
+
     def transform(self, game_events):
         players = {}  # all players active this game
 
@@ -251,8 +510,8 @@ class Pipeline:
             self.lineup_parser.append(event)
 
             # ------------ parse the play ------------
-            self.play.parse(event['theplay'], event['baserunning'])
-            num_run_scored = len(self.play.score)
+            play = self.play_cache.parse(event['theplay'], event['baserunning'])
+            num_run_scored = len(play.score)
             visitor_batting = event['visitor_or_home'] == '0'
             if visitor_batting:
                 vis_score += num_run_scored
@@ -262,67 +521,110 @@ class Pipeline:
             #  ------------ parse batting ------------
             batter_id = event['batterID']
             add_player(batter_id)
-            players[batter_id].batting.append(self.play)
+            players[batter_id].batting.append(play)
 
             #  ------------ parse base running ------------
             for runner, label in runner_map.items():
                 runner_id = event[label]
                 if runner_id != '':
                     add_player(runner_id)
-                    players[runner_id].base_running.append(self.play, runner)
+                    players[runner_id].base_running.append(play, runner)
 
             #  ------------ parse fielding ------------
             for position, label in position_map.items():
                 fielder_id = event[label]
                 add_player(fielder_id)
-                players[fielder_id].fielding.append(self.play, position)
+                players[fielder_id].fielding.append(play, position)
 
             #  ------------ parse pitching ------------
             pitcher_id = event['pitcherID']
             add_player(pitcher_id)
-            players[pitcher_id].pitching.append(self.play)
+            players[pitcher_id].pitching.append(play)
 
         home_win = 1 if home_score > vis_score else 0
         game_result = {'vis_score': vis_score, 'home_score': home_score, 'result': home_win}
 
         #  ------------ build starting lineup ------------
-        starting_lineup = self.lineup_parser.fetch()
+        starting_lineup = self.fetch_lineup()
 
         return players, game_result, starting_lineup
 
-    def load(self, connection, game_data):
-        cursor = connection.cursor()
-
+    def transform_matrix(self, games):
+        # parse every event of the season into one matrix, then accumulate stats per player and game with numpy
+        # games is any iterable of (game_id, game_events), i.e. extract_games(year) or extract(year).items()
+        matrix = EventMatrix(self.play_cache)
+        starting_lineups = []
+        for game_id, game_events in games:
+            matrix.append_game(game_id)
+            self.lineup_parser.reset()
+            for event in game_events:
+                self.lineup_parser.append(event)
+                matrix.append(event)
+            starting_lineups.append(self.fetch_lineup())
+
+        assert len(set(matrix.game_ids)) == len(matrix.game_ids), 'season file is not grouped by game'
+
+        events = matrix.build()
+        num_game = len(matrix.game_ids)
+        vis_score, home_score = game_scores(events, num_game)
+        player_ids = matrix.player_ids()
+        games, players, features = player_game_features(events, len(player_ids))
+
+        # rows are sorted by game, find where each game's players start and end
+        bounds = np.searchsorted(games, np.arange(num_game + 1))
+
+        game_data = {}
+        for game, game_id in enumerate(matrix.game_ids):
+            game_players = {}
+            for idx in range(bounds[game], bounds[game + 1]):
+                game_players[player_ids[players[idx]]] = features[idx]
+
+            home_win = 1 if home_score[game] > vis_score[game] else 0
+            game_result = {'vis_score': int(vis_score[game]), 'home_score': int(home_score[game]), 'result': home_win}
+
+            game_data[game_id] = (game_players, game_result, starting_lineups[game])
+        return game_data
+
+    def transform_season(self, year):
+        # stream games straight into transform, only the much smaller transformed games are held
+        # until load, which needs the whole season to sort games chronologically
+        if self.use_matrix:
+            return self.transform_matrix(self.extract_games(year))
+
+        game_data = {}
+        for game_id, game_events in self.extract_games(year):
+            # print('transforming game: {}'.format(game_id))
+            assert game_id not in game_data, 'season file is not grouped by game: {}'.format(game_id)
+            game_data[game_id] = self.transform(game_events)
+        return game_data
+
+    def load(self, connection, game_data, year=None, fit_scaler=True):
         # reformat data to load into tables
         game_table_data = []
         # get games in chronological order to correctly calculate prefix sum
         all_games = sorted(game_data.keys(), key=game_id_to_datetime)
-        for game_id in all_games:
+        season_features = np.zeros((len(all_games), self.num_aggregate_feature))
+        for game_idx, game_id in enumerate(all_games):
             players, game_result, starting_lineup = game_data[game_id]
             assert len(starting_lineup) == self.num_player
             game_datetime = str(game_id_to_datetime(game_id))
 
             # aggregate individual player features ordered by team and position
-            # any expected players missing from lineup have features initialized as zeros
-            aggregate_features = [0] * self.num_aggregate_feature
-            for player_id in starting_lineup:
-                if player_id in self.prefix_sum:
-                    offset = starting_lineup[player_id] * self.num_feature
-                    aggregate_features[offset:offset + self.num_feature] = self.prefix_sum[player_id]
-                else:
-                    # leave players spot in aggregate feature as zeros if we haven't seen them yet
-                    pass
-            self.scaler.update(aggregate_features)
+            # any expected players missing from lineup, or not seen yet, have features initialized as zeros
+            aggregate_features = season_features[game_idx].reshape(self.num_player, self.num_feature)
+            aggregate_features[list(starting_lineup.values())] = self.prefix_sum.gather(starting_lineup)
+            unseen = [idx for player_id, idx in starting_lineup.items() if player_id not in self.prefix_sum]
 
             # update the prefix sum after aggregation
-            for player_id, player in players.items():
-                # if player not seen yet, initialize prefix to zero
-                if player_id not in self.prefix_sum:
-                    self.prefix_sum[player_id] = [0] * self.num_feature
-
-                player_game_features = player.features()
-                for idx in range(self.num_feature):
-                    self.prefix_sum[player_id][idx] += player_game_features[idx]
+            if players:
+                player_game_features = []
+                for player in players.values():
+                    if isinstance(player, Player):
+                        player_game_features.append(player.features())
+                    else:
+                        # matrix transform provides each player's game features directly
+                        player_game_features.append(player)
+                self.prefix_sum.add(players, player_game_features)
 
             # store the feature and label for this game
             row = [
@@ -332,10 +634,33 @@ class Pipeline:
                 game_result['home_score'],
                 game_result['result']
             ]
-            row += aggregate_features
+            if self.blob_features:
+                row.append(season_features[game_idx].astype(np.float32).tobytes())
+            else:
+                # counts are stored as integers, and players not seen yet as integer zeros, but only when
+                # the counts are whole numbers
+                features = season_features[game_idx].astype(object)
+                counts = season_features[game_idx, self.integer_features]
+                if np.array_equal(counts, np.trunc(counts)):
+                    features[self.integer_features] = counts.astype(np.int64)
+                    features.reshape(self.num_player, self.num_feature)[unseen] = 0
+                row += features.tolist()
             game_table_data.append(tuple(row))
 
+        # fold the whole season into the scaler at once
+        if fit_scaler:
+            self.scaler.update_many(season_features)
+
+        # seasons outside every split only contribute to career features, load_season checkpoints them
+        if connection is None:
+            return
+        cursor = connection.cursor()
+
         # create new game table if it doesn't already exist
+        if self.blob_features:
+            feature_columns = ['features BLOB']
+        else:
+            feature_columns = self.feature_header
         cmd = """
             CREATE TABLE IF NOT EXISTS
                 game(
@@ -346,7 +671,7 @@ class Pipeline:
                     result,
                     {}
                 )
-        """.format(',\n'.join(self.feature_header))
+        """.format(',\n'.join(feature_columns))
         cursor.execute(cmd)
         connection.commit()
 
@@ -355,8 +680,86 @@ class Pipeline:
             num_column = len(game_table_data[0])
             cmd = 'INSERT INTO game VALUES({})'.format(', '.join(['?'] * num_column))
             cursor.executemany(cmd, game_table_data)
+
+        # checkpoint in the same transaction as the season's games, so a crash leaves both or neither
+        if year is not None:
+            self.save_state(connection, year)
         connection.commit()
 
+    def split_files(self):
+        # name -> output database, a single unnamed database unless splits are set
+        if self.splits is None:
+            return {None: self.db_file}
+        return {name: os.path.join(self.data_path, '{}.db'.format(name)) for name in self.splits}
+
+    def split_for(self, year):
+        if self.splits is None:
+            return None
+        for name, (lo_year, hi_year) in self.splits.items():
+            if lo_year <= year <= hi_year:
+                return name
+        return None
+
+    def load_season(self, connections, game_data, year):
+        # route the season to the database of its split
+        split = self.split_for(year)
+        fit_scaler = self.splits is None or split == self.fit_split
+        connection = connections.get(split)
+        self.load(connection, game_data, year, fit_scaler)
+
+        # seasons outside every split are still resume points, checkpointed in the fit split's database
+        if connection is None:
+            checkpoint = connections.get(self.fit_split, next(iter(connections.values())))
+            self.save_state(checkpoint, year)
+            checkpoint.commit()
+
+    def save_state(self, connection, year):
+        # career prefix sums, scaler accumulators and bullpens after the given season, as one npz blob
+        # left uncommitted so it can share a transaction with the season's games
+        state = {'year': np.array(year)}
+        state.update(self.prefix_sum.state())
+        state.update(self.scaler.state())
+        state.update(self.lineup_parser.state())
+        buffer = io.BytesIO()
+        np.savez(buffer, **state)
+
+        cursor = connection.cursor()
+        cmd = """
+            CREATE TABLE IF NOT EXISTS
+                pipeline_state(
+                    id INTEGER PRIMARY KEY,
+                    year INTEGER,
+                    state BLOB
+                )
+        """
+        cursor.execute(cmd)
+        cmd = 'INSERT OR REPLACE INTO pipeline_state VALUES(0, ?, ?)'
+        cursor.execute(cmd, (year, buffer.getvalue()))
+
+    def saved_year(self, connection):
+        # season of the state saved by save_state, or None if nothing was saved
+        cursor = connection.cursor()
+        cmd = "SELECT name FROM sqlite_master WHERE type='table' AND name='pipeline_state'"
+        if cursor.execute(cmd).fetchone() is None:
+            return None
+        row = cursor.execute('SELECT year FROM pipeline_state WHERE id=0').fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def load_state(self, connection):
+        # restore the state saved by save_state and return its season, or None if nothing was saved
+        if self.saved_year(connection) is None:
+            return None
+        cursor = connection.cursor()
+        year, blob = cursor.execute('SELECT year, state FROM pipeline_state WHERE id=0').fetchone()
+        with np.load(io.BytesIO(blob), allow_pickle=False) as state:
+            state = dict(state)
+        self.prefix_sum.restore(state)
+        self.scaler.restore(state)
+        self.lineup_parser.restore(state)
+        return year
+
     def publish(self, connection):
         cursor = connection.cursor()
 
@@ -379,53 +782,171 @@ class Pipeline:
             tuple([1, 'std'] + list(std))
         ]
         num_column = len(scaler_table_data[0])
-        cmd = 'INSERT INTO scaler VALUES({})'.format(', '.join(['?'] * num_column))
+        # replace any statistics from an earlier run this one resumed from
+        cmd = 'INSERT OR REPLACE INTO scaler VALUES({})'.format(', '.join(['?'] * num_column))
         cursor.executemany(cmd, scaler_table_data)
         connection.commit()
 
-    def process(self):
-        if os.path.exists(self.db_file):
-            print('file {} already exists'.format(self.db_file))
+    def array_path(self, db_file):
+        # directory of .npy files exported from a database, i.e. ../data/features.db -> ../data/features
+        return os.path.splitext(db_file)[0]
+
+    def export(self, connection, array_path):
+        # write normalized features, labels, game ids and datetimes in game id order as .npy files, so
+        # training can memory map them and data loader workers share pages instead of each querying sqlite
+        if not self.has_games(connection):
+            print('  no games to export to {}'.format(array_path))
             return
+        cursor = connection.cursor()
 
-        con = sqlite3.connect(self.db_file)
+        # normalize in float32 exactly as BaseballDataset does
+        scaler_index = 2
+        row = cursor.execute("SELECT * FROM scaler WHERE id=0 AND statistic='mu'").fetchone()
+        mu = np.array(row[scaler_index:], dtype=np.float32)
+        row = cursor.execute("SELECT * FROM scaler WHERE id=1 AND statistic='std'").fetchone()
+        std = np.array(row[scaler_index:], dtype=np.float32)
+
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(game)')]
+        blob_features = 'features' in columns
+        num_game = cursor.execute('SELECT COUNT(*) FROM game').fetchone()[0]
+
+        # features are written straight into the mapped file rather than built up in memory
+        os.makedirs(array_path, exist_ok=True)
+        shape = (num_game, self.num_player, self.num_feature)
+        features = np.lib.format.open_memmap(os.path.join(array_path, 'features.npy'), mode='w+',
+                                             dtype=np.float32, shape=shape)
+        labels = np.empty(num_game, dtype=np.int64)
+        game_ids = np.empty(num_game, dtype='U12')
+        datetimes = np.empty(num_game, dtype='datetime64[s]')
+
+        feature_index = 5
+        for idx, row in enumerate(cursor.execute('SELECT * FROM game ORDER BY game_id')):
+            if blob_features:
+                x = np.frombuffer(row[feature_index], dtype=np.float32)
+            else:
+                x = np.array(row[feature_index:], dtype=np.float32)
+            features[idx] = ((x - mu) / std).reshape(self.num_player, self.num_feature)
+            game_ids[idx] = row[0]
+            datetimes[idx] = row[1]
+            labels[idx] = row[4]
+        features.flush()
+        del features
+
+        np.save(os.path.join(array_path, 'labels.npy'), labels)
+        np.save(os.path.join(array_path, 'game_ids.npy'), game_ids)
+        np.save(os.path.join(array_path, 'datetimes.npy'), datetimes)
+        print('  exported {} games to {}'.format(num_game, array_path))
+
+    def process_parallel(self, connections, years):
+        # workers extract and transform seasons concurrently, but seasons are loaded here
+        # one at a time in year order, so prefix sums and bullpens match a serial run
+        initargs = (self.worker_args, self.season_path, self.lo_year, self.hi_year)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers, initializer=init_worker,
+                                                    initargs=initargs) as executor:
+            # bound the number of transformed seasons waiting to be loaded
+            pending = collections.deque()
+            for year in years:
+                pending.append((year, executor.submit(transform_season, year)))
+                if len(pending) > 2 * self.num_workers:
+                    loaded_year, future = pending.popleft()
+                    game_data = future.result()
+                    self.resolve_lineups(game_data)
+                    self.load_season(connections, game_data, loaded_year)
+
+            while pending:
+                loaded_year, future = pending.popleft()
+                game_data = future.result()
+                self.resolve_lineups(game_data)
+                self.load_season(connections, game_data, loaded_year)
+
+    def process(self, resume=False):
+        # every season is checkpointed as it is loaded, resume carries on after the last completed season
+        # of an existing database, whether it was finished or interrupted
+        db_files = self.split_files()
+        db_exists = [db_file for db_file in db_files.values() if os.path.exists(db_file)]
+        if db_exists and not resume:
+            print('file {} already exists'.format(db_exists[0]))
+            return
+
+        connections = {name: sqlite3.connect(db_file) for name, db_file in db_files.items()}
+
+        lo_year = self.lo_year
+        if db_exists:
+            # with splits, the latest checkpoint is in the database of the last season loaded
+            saved = [(self.saved_year(con), name) for name, con in connections.items()]
+            saved = [(year, name) for year, name in saved if year is not None]
+            if saved:
+                last_year, name = max(saved)
+                self.load_state(connections[name])
+                print('  resuming after {}'.format(last_year))
+                lo_year = max(lo_year, last_year + 1)
+            elif any(self.has_games(con) for con in connections.values()):
+                print('file {} has no saved state to resume from'.format(db_exists[0]))
+                for con in connections.values():
+                    con.close()
+                return
 
         tic = time.time()
 
-        for year in range(self.lo_year, self.hi_year + 1):
-            # extract
-            raw_data = self.extract(year)
+        years = range(lo_year, self.hi_year + 1)
+        if self.num_workers > 1:
+            self.process_parallel(connections, years)
+        else:
+            for year in years:
+                # extract and transform
+                game_data = self.transform_season(year)
 
-            # transform
-            game_data = {}
-            for game_id, game_events in raw_data.items():
-                # print('transforming game: {}'.format(game_id))
-                game_data[game_id] = self.transform(game_events)
+                # load
+                self.load_season(connections, game_data, year)
 
-            # load
-            self.load(con, game_data)
+        # publish, every split is normalized with the same fitted statistics
+        for con in connections.values():
+            self.publish(con)
 
-        # publish
-        self.publish(con)
+        if self.export_arrays:
+            for name, con in connections.items():
+                self.export(con, self.array_path(db_files[name]))
 
         toc = time.time()
         print('  processed all seasons in {} seconds'.format(toc - tic))
+        if self.num_workers <= 1:
+            self.play_cache.print_stats()
+
+        for con in connections.values():
+            con.close()
+
+    def has_games(self, connection):
+        cursor = connection.cursor()
+        cmd = "SELECT name FROM sqlite_master WHERE type='table' AND name='game'"
+        if cursor.execute(cmd).fetchone() is None:
+            return False
+        return cursor.execute('SELECT 1 FROM game LIMIT 1').fetchone() is not None
+
+
+# pipeline used by each worker process to extract and transform seasons
+worker_pipeline = None
+
+
+def init_worker(worker_args, season_path, lo_year, hi_year):
+    global worker_pipeline
+    worker_pipeline = Pipeline(**worker_args)
+    worker_pipeline.season_path = season_path
+    worker_pipeline.lo_year = lo_year
+    worker_pipeline.hi_year = hi_year
+    worker_pipeline.defer_lineup = True
+
 
-        con.close()
+def transform_season(year):
+    return worker_pipeline.transform_season(year)
 
 
 if __name__ == '__main__':
-    print('generating train database...')
-    train_pipe = Pipeline('train')
-    train_pipe.hi_year = 2020
-    train_pipe.process()
-
-    print('generating valid database...')
-    valid_pipe = Pipeline('valid')
-    valid_pipe.lo_year = valid_pipe.hi_year = 2021
-    valid_pipe.process()
-
-    print('generating test database...')
-    test_pipe = Pipeline('test')
-    test_pipe.lo_year = test_pipe.hi_year = 2022
-    test_pipe.process()
+    # one pass over every season, so valid and test games have full career features
+    print('generating train, valid and test databases...')
+    pipe = Pipeline(export_arrays=True)
+    pipe.splits = {
+        'train': (1914, 2020),
+        'valid': (2021, 2021),
+        'test': (2022, 2022),
+    }
+    pipe.process()
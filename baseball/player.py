@@ -1,5 +1,60 @@
 import re
 import datetime
+import collections
+
+
+# fielders or runners listed in parentheses, i.e. the (1) in 64(1)3 or the (52) in 3X4(52)
+target_pattern = re.compile(r'\((.*?)\)')
+runner_target_pattern = re.compile(r'\([B1234]*?\)')
+
+# main play codes and the flags they set, in the order they must be matched
+# longer codes come before any shorter code they start with, i.e. WP before W and DGR before D
+main_play_codes = {
+    'WP': ('wild_pitch',),
+    'HP': ('hit_by_pitch',),
+    'H': ('home_run',),  # also matches HR
+    'I': ('intentional_walk',),  # also matches IW
+    'NP': ('no_play',),  # for substitutions
+    'BK': ('balk',),
+    'DGR': ('double', 'ground_rule_double'),
+    'DI': ('defensive_indifference',),  # no attempt to prevent stolen base
+    'PO': (),
+    'CS': (),
+    'PB': ('passed_ball',),
+    'E': ('error_batter_on_base',),
+    'SB': (),
+    'K': (),
+    'S': ('single',),
+    'D': ('double',),
+    'T': ('triple',),
+    'W': ('walk',),
+    'FC': ('fielders_choice',),
+    'FLE': ('error_on_foul_fly_ball',),
+    'C': ('catcher_interference',),
+    'OA': ('other_advance',),
+}
+main_play_pattern = re.compile('|'.join(main_play_codes))
+
+# modifier codes and the flags they set, in the order they must be matched
+modifier_codes = {
+    'FO': ('force_out',),
+    'GDP': ('ground_ball', 'double_play', 'ground_double_play'),
+    'LDP': ('line_drive', 'double_play', 'line_double_play'),
+    'GTP': ('ground_ball', 'triple_play', 'ground_triple_play'),
+    'LTP': ('line_drive', 'triple_play', 'line_triple_play'),
+    'SF': ('sacrifice_fly',),
+    'SH': ('sacrifice_hit',),
+    'DP': ('double_play',),
+    'TP': ('triple_play',),
+    'E': (),
+    'G': ('ground_ball',),
+    'L': ('line_drive',),
+    'P': ('pop_up',),
+    'F': ('fly_ball',),
+    'BG': ('bunt_grounder',),
+    'BP': ('bunt_pop_up',),
+}
+modifier_pattern = re.compile('|'.join(modifier_codes))
 
 
 class Play:
@@ -68,7 +123,6 @@ class Play:
         self.balk = 0
         self.batter_out = 0
         self.catcher_interference = 0
-        self.caught_stealing = 0
         self.defensive_indifference = 0
         self.double = 0
         self.dropped_third_strike = 0
@@ -109,15 +163,15 @@ class Play:
         self.sacrifice_hit = 0
         self.triple_play = 0
 
-        # derived statistics
-        self.put_out = []
-        self.assist = []
-        self.error = []
-        self.score = []
-        self.stolen_base = []
-        self.pick_off = []
-        self.caught_stealing = []
-        self.advance = []
+        # derived statistics, lists are cleared in place rather than reallocated for every play
+        self.put_out.clear()
+        self.assist.clear()
+        self.error.clear()
+        self.score.clear()
+        self.stolen_base.clear()
+        self.pick_off.clear()
+        self.caught_stealing.clear()
+        self.advance.clear()
         self.num_out = 0
         self.num_run = 0
         self.run_batted_in = 0
@@ -157,18 +211,18 @@ class Play:
 
     def parse_extra_event(self, play, fielders):
         # the extra event can be one of SB%, CS%, OA, PO%, PB, WP and E$.
-        if play.find('PO') >= 0 or play.find('CS') >= 0:
+        if 'PO' in play or 'CS' in play:
             self.parse_pick_off_caught_stealing(play, fielders)
-        elif play.find('SB') >= 0:
+        elif 'SB' in play:
             stolen_base_idx = play.find('SB')
             self.stolen_base.append(play[stolen_base_idx + 2])
-        elif play.find('OA') >= 0:
+        elif 'OA' in play:
             self.other_advance = 1
-        elif play.find('PB') >= 0:
+        elif 'PB' in play:
             self.passed_ball = 1
-        elif play.find('WP') >= 0:
+        elif 'WP' in play:
             self.wild_pitch = 1
-        elif play.find('E') >= 0:
+        elif 'E' in play:
             error_idx = play.find('E')
             self.error.append(play[error_idx + 1])
         else:
@@ -177,8 +231,8 @@ class Play:
     def parse_main_play(self, main_play):
         # outs coded as integer position codes, last one gets a put out, every other gets an assist
         # i.e. 63 for shortstop to first base, or 64(1)43 for double play
-        targets = re.findall(r'\((.*?)\)', main_play)
-        main_play = re.sub(r'\([B1234]*?\)', self.separator, main_play)
+        targets = target_pattern.findall(main_play)
+        main_play = runner_target_pattern.sub(self.separator, main_play)
         events = main_play.strip(self.separator).split(self.separator)
         first = events[0]
         if len(first) > 0 and first[0].isdigit():
@@ -197,111 +251,52 @@ class Play:
                     else:
                         self.put_out.append(fielders[-1])
                         self.assist += list(fielders[:-1])
-        elif first.find('WP') == 0:  # parse longer codes first, must be before W
-            self.wild_pitch = 1
-        elif first.find('HP') == 0:  # must occur before H
-            self.hit_by_pitch = 1
-        elif first.find('HR') == 0 or first.find('H') == 0:
-            self.home_run = 1
-            self.score.append('B')
-            self.earned_run = 1
-        elif first.find('IW') == 0 or first.find('I') == 0:
-            self.intentional_walk = 1
-        elif first.find('NP') == 0:
-            self.no_play = 1  # for substitutions
-        elif first.find('BK') == 0:
-            self.balk = 1
-        elif first.find('DGR') == 0:  # must occur before D
-            self.double = 1
-            self.ground_rule_double = 1
-        elif first.find('DI') == 0:  # must occur before D
-            self.defensive_indifference += 1  # no attempt to prevent stolen base
-        elif first.find('PO') == 0 or first.find('CS') == 0:  # must occur before C
-            self.parse_pick_off_caught_stealing(first, targets)
-        elif first.find('PB') == 0:
-            self.passed_ball = 1
-        elif first.find('E') == 0:
-            self.error.append(first[1])
-            self.error_batter_on_base = 1
-        elif first.find('SB') == 0:  # must be before S
-            for advance in first.split(';'):
-                stolen_base_idx = advance.find('SB')
-                self.stolen_base.append(advance[stolen_base_idx + 2])
-        elif first.find('K') == 0:
-            sub_event = first.split('+')[0]
-            if sub_event == 'K':
-                self.strike_out = 1
-                self.put_out.append('2')  # catcher gets credit for strikeout
-            else:
-                self.dropped_third_strike = 1
-                self.put_out.append(sub_event[-1])
-                self.assist += list(sub_event[1:-1])
-        elif first.find('S') == 0:
-            self.single = 1
-        elif first.find('D') == 0:
-            self.double = 1
-        elif first.find('T') == 0:
-            self.triple = 1
-        elif first.find('W') == 0:
-            self.walk = 1
-        elif first.find('FC') == 0:
-            self.fielders_choice = 1
-        elif first.find('FLE') == 0:
-            self.error_on_foul_fly_ball = 1
-            self.error.append(first[3])
-        elif first.find('C') == 0:
-            self.catcher_interference = 1
-        elif first.find('OA') == 0:
-            self.other_advance = 1
         else:
-            self.unknown = 1
+            match = main_play_pattern.match(first)
+            if match is None:
+                self.unknown = 1
+            else:
+                code = match.group()
+                for flag in main_play_codes[code]:
+                    setattr(self, flag, 1)
+
+                if code == 'H':
+                    self.score.append('B')
+                    self.earned_run = 1
+                elif code == 'PO' or code == 'CS':
+                    self.parse_pick_off_caught_stealing(first, targets)
+                elif code == 'E':
+                    self.error.append(first[1])
+                elif code == 'SB':
+                    for advance in first.split(';'):
+                        stolen_base_idx = advance.find('SB')
+                        self.stolen_base.append(advance[stolen_base_idx + 2])
+                elif code == 'K':
+                    sub_event = first.split('+')[0]
+                    if sub_event == 'K':
+                        self.strike_out = 1
+                        self.put_out.append('2')  # catcher gets credit for strikeout
+                    else:
+                        self.dropped_third_strike = 1
+                        self.put_out.append(sub_event[-1])
+                        self.assist += list(sub_event[1:-1])
+                elif code == 'FLE':
+                    self.error.append(first[3])
 
         # parse any additional events present
-        if first.find('+') >= 0:
+        if '+' in first:
             self.parse_extra_event(first, targets)
 
     def parse_modifier(self, modifier):
-        if modifier.find('FO') == 0:
-            self.force_out = 1
-        elif modifier.find('GDP') == 0:
-            self.ground_ball = 1
-            self.double_play = 1
-            self.ground_double_play = 1
-        elif modifier.find('LDP') == 0:
-            self.line_drive = 1
-            self.double_play = 1
-            self.line_double_play = 1
-        elif modifier.find('GTP') == 0:
-            self.ground_ball = 1
-            self.triple_play = 1
-            self.ground_triple_play = 1
-        elif modifier.find('LTP') == 0:
-            self.line_drive = 1
-            self.triple_play = 1
-            self.line_triple_play = 1
-        elif modifier.find('SF') == 0:
-            self.sacrifice_fly = 1
-        elif modifier.find('SH') == 0:
-            self.sacrifice_hit = 1
-        elif modifier.find('DP') == 0:
-            self.double_play = 1
-        elif modifier.find('TP') == 0:
-            self.triple_play = 1
-        elif modifier.find('E') == 0:
-            # appears as part of a C/E2 for catcher interference
-            self.error.append(modifier[1])
-        elif modifier.find('G') == 0:
-            self.ground_ball = 1
-        elif modifier.find('L') == 0:
-            self.line_drive = 1
-        elif modifier.find('P') == 0:
-            self.pop_up = 1
-        elif modifier.find('F') == 0:
-            self.fly_ball = 1
-        elif modifier.find('BG') == 0:
-            self.bunt_grounder = 1
-        elif modifier.find('BP') == 0:
-            self.bunt_pop_up = 1
+        match = modifier_pattern.match(modifier)
+        if match is not None:
+            code = match.group()
+            if code == 'E':
+                # appears as part of a C/E2 for catcher interference
+                self.error.append(modifier[1])
+            else:
+                for flag in modifier_codes[code]:
+                    setattr(self, flag, 1)
 
     def parse_base_running(self, base_running):
         for advance in base_running.split(';'):
@@ -310,50 +305,50 @@ class Play:
             if error_idx >= 0:
                 self.error.append(advance[error_idx + 1])
 
-            if advance.find('X') >= 0:
+            if 'X' in advance:
                 # outs on base running, e.g. 3X4(52), list positions assigned assist and putout
                 self.num_out += 1
-                fielders = re.findall(r'\((.*?)\)', advance)
+                fielders = target_pattern.findall(advance)
                 for f in fielders:
                     self.put_out.append(f[-1])
                     self.assist += list(f[:-1])
 
             # score runs regardless of errors
             # batter scores
-            if (advance.find('0-4') >= 0) or advance.find('0-H') >= 0:
+            if '0-4' in advance or '0-H' in advance:
                 # add if not present, i.e. triple, score on error
                 if 'B' not in self.score:
                     self.score.append('B')
 
             # score from first
-            if (advance.find('1-4') >= 0) or advance.find('1-H') >= 0:
+            if '1-4' in advance or '1-H' in advance:
                 self.score.append('1')
                 if error_idx < 0:
                     self.earned_run += 1
 
             # score from second
-            if (advance.find('2-4') >= 0) or advance.find('2-H') >= 0:
+            if '2-4' in advance or '2-H' in advance:
                 self.score.append('2')
                 if error_idx < 0:
                     self.earned_run += 1
 
             # score from third
-            if (advance.find('3-4') >= 0) or advance.find('3-H') >= 0:
+            if '3-4' in advance or '3-H' in advance:
                 self.score.append('3')
                 if error_idx < 0:
                     self.earned_run += 1
 
             # runner's advance a base
             # first to second
-            if advance.find('1-2') >= 0:
+            if '1-2' in advance:
                 self.advance.append('1-2')
 
             # first to third
-            if advance.find('1-3') >= 0:
+            if '1-3' in advance:
                 self.advance.append('1-3')
 
             # second to third
-            if advance.find('2-3') >= 0:
+            if '2-3' in advance:
                 self.advance.append('2-3')
 
             # count all scores for runs
@@ -386,11 +381,98 @@ class Play:
         # include all putouts from fielding play and base running
         self.num_out = len(self.put_out)
 
+    def freeze(self):
+        return ParsedPlay(
+            # direct play codes
+            self.balk, self.batter_out, self.catcher_interference, self.defensive_indifference, self.double,
+            self.dropped_third_strike, self.error_batter_on_base, self.error_on_foul_fly_ball, self.fielders_choice,
+            self.ground_rule_double, self.home_run, self.hit_by_pitch, self.intentional_walk, self.no_play,
+            self.other_advance, self.passed_ball, self.single, self.strike_out, self.triple, self.unknown,
+            self.walk, self.wild_pitch,
+
+            # modifier codes
+            self.bunt_grounder, self.bunt_pop_up, self.double_play, self.fly_ball, self.force_out,
+            self.ground_ball, self.ground_double_play, self.ground_triple_play, self.line_double_play,
+            self.line_drive, self.line_triple_play, self.pop_up, self.sacrifice_fly, self.sacrifice_hit,
+            self.triple_play,
+
+            # derived statistics
+            ''.join(self.put_out), ''.join(self.assist), ''.join(self.error), ''.join(self.score),
+            ''.join(self.stolen_base), ''.join(self.pick_off), ''.join(self.caught_stealing), tuple(self.advance),
+            self.num_out, self.num_run, self.run_batted_in, self.earned_run,
+        )
+
+
+# immutable record of a parsed play, compact enough to cache and pickle between processes
+# position and base codes are single characters, so their lists are packed into strings,
+# i.e. put_out '43' and assist '6' for 64(1)3, or score 'B3' for a two run home run
+ParsedPlay = collections.namedtuple('ParsedPlay', [
+    # direct play codes
+    'balk', 'batter_out', 'catcher_interference', 'defensive_indifference', 'double',
+    'dropped_third_strike', 'error_batter_on_base', 'error_on_foul_fly_ball', 'fielders_choice',
+    'ground_rule_double', 'home_run', 'hit_by_pitch', 'intentional_walk', 'no_play', 'other_advance',
+    'passed_ball', 'single', 'strike_out', 'triple', 'unknown', 'walk', 'wild_pitch',
+
+    # modifier codes
+    'bunt_grounder', 'bunt_pop_up', 'double_play', 'fly_ball', 'force_out', 'ground_ball',
+    'ground_double_play', 'ground_triple_play', 'line_double_play', 'line_drive', 'line_triple_play',
+    'pop_up', 'sacrifice_fly', 'sacrifice_hit', 'triple_play',
+
+    # derived statistics
+    'put_out', 'assist', 'error', 'score', 'stolen_base', 'pick_off', 'caught_stealing', 'advance',
+    'num_out', 'num_run', 'run_batted_in', 'earned_run',
+])
+
+
+class PlayCache:
+    def __init__(self, max_size=65536):
+        self.max_size = max_size
+        self.play = Play()
+
+        # least recently used entries are evicted from the front
+        self.cache = collections.OrderedDict()
+
+        self.hit = 0
+        self.miss = 0
+
+    def reset(self):
+        self.cache.clear()
+        self.hit = 0
+        self.miss = 0
+
+    def hit_rate(self):
+        count = self.hit + self.miss
+        if count > 0:
+            return self.hit / count
+        return 0.0
+
+    def parse(self, the_play, base_running=''):
+        key = (the_play, base_running)
+        parsed_play = self.cache.get(key)
+        if parsed_play is not None:
+            self.hit += 1
+            self.cache.move_to_end(key)
+            return parsed_play
+
+        self.miss += 1
+        self.play.parse(the_play, base_running)
+        parsed_play = self.play.freeze()
+        self.cache[key] = parsed_play
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return parsed_play
+
+    def print_stats(self):
+        print('play cache: size {}/{}, hit {}, miss {}, hit rate {:5.3f}'.format(
+            len(self.cache), self.max_size, self.hit, self.miss, self.hit_rate()))
+
+
+# shared by the stat classes when parsing plays directly from the event table
+play_cache = PlayCache()
+
 
 class Batting:
     def __init__(self):
-        self.my_play = Play()
-
         # accumulate statistics
         self.sacrifice_hit = 0
         self.sacrifice_fly = 0
@@ -517,8 +599,7 @@ class Batting:
             self.slugging = self.total_bases / self.at_bat
 
     def parse(self, the_play, base_running):
-        self.my_play.parse(the_play, base_running)
-        self.append(self.my_play)
+        self.append(play_cache.parse(the_play, base_running))
 
     def print_stats(self):
         header = ['AB', 'R', 'H', '2B', '3B', 'HR', 'RBI',
@@ -549,8 +630,6 @@ class Batting:
 
 class BaseRunning:
     def __init__(self):
-        self.my_play = Play()
-
         self.advance12 = 0
         self.advance13 = 0
         self.advance23 = 0
@@ -662,14 +741,11 @@ class BaseRunning:
                 self.advance23 += 1
 
     def parse(self, the_play, base_running, runner):
-        self.my_play.parse(the_play, base_running)
-        self.append(self.my_play, runner)
+        self.append(play_cache.parse(the_play, base_running), runner)
 
 
 class Fielding:
     def __init__(self):
-        self.my_play = Play()
-
         self.num_out = 0
         self.total_chance = 0
         self.put_out = 0
@@ -742,8 +818,7 @@ class Fielding:
             self.fielding = (self.put_out + self.assist) / self.total_chance
 
     def parse(self, the_play, base_running, position):
-        self.my_play.parse(the_play, base_running)
-        self.append(self.my_play, position)
+        self.append(play_cache.parse(the_play, base_running), position)
 
     def print_stats(self):
         header = ['INN', 'TC', 'PO', 'A', 'E', 'DP', 'TP', 'PB', 'F']
@@ -767,8 +842,6 @@ class Fielding:
 
 class Pitching:
     def __init__(self):
-        self.my_play = Play()
-
         self.num_out = 0
         self.strike_out = 0
         self.single = 0
@@ -853,8 +926,7 @@ class Pitching:
         self.hit = self.single + self.double + self.triple + self.home_run
 
     def parse(self, the_play, base_running):
-        self.my_play.parse(the_play, base_running)
-        self.append(self.my_play)
+        self.append(play_cache.parse(the_play, base_running))
 
     def print_stats(self):
         header = ['ERA', 'IP', 'K', 'H', 'ER', 'R', 'HR', 'BB', 'IBB', 'WP', 'HBP', 'BK']
@@ -893,6 +965,122 @@ def game_id_to_datetime(gameID):
     return datetime.datetime(int(year), int(month), int(day), hour=int(game))
 
 
+# every column that can tie a player to an event
+batter_column = 'batterID'
+runner_columns = ('runner_1b', 'runner_2b', 'runner_3b')
+fielder_columns = (
+    'pitcherID',
+    'field_C_playerID',
+    'field_1B_playerID',
+    'field_2B_playerID',
+    'field_3B_playerID',
+    'field_SS_playerID',
+    'field_LF_playerID',
+    'field_CF_playerID',
+    'field_RF_playerID',
+)
+role_columns = (batter_column,) + runner_columns + fielder_columns
+
+
+# player queries bind the player id and year as parameters, so each statement text stays the same from player to
+# player and sqlite reuses the prepared statement from its cache rather than planning the query again
+# {filters} is filled in with the optional filters below, never with values
+year_filter = ' AND theyear=:year'
+
+# month, day and game are read from the gameID, i.e. ANA202204070, so rows outside them are never returned
+month_filter = ' AND substr(gameID, 8, 2)=:month'
+day_filter = ' AND substr(gameID, 10, 2)=:day'
+game_filter = ' AND substr(gameID, 12, 1)=:game'
+
+
+def event_filters(year=None, month=None, day=None, game=None):
+    filters = ''
+    params = {}
+    for name, value, event_filter in (('year', year, year_filter),
+                                      ('month', month, month_filter),
+                                      ('day', day, day_filter),
+                                      ('game', game, game_filter)):
+        if value is not None:
+            filters += event_filter
+            params[name] = str(value)
+    return filters, params
+
+
+batting_query = """
+SELECT
+   eventID, gameID, theplay, baserunning
+FROM
+   event
+WHERE
+   batterID=:player_id{filters}
+"""
+
+base_running_query = """
+SELECT
+   eventID, gameID, batterID, runner_1b, runner_2b, runner_3b, theplay, baserunning
+FROM
+   event
+WHERE
+   (runner_1b=:player_id OR runner_2b=:player_id OR runner_3b=:player_id){filters}
+"""
+
+fielding_query = """
+SELECT
+   eventID, gameID, theplay, baserunning,
+   pitcherID, field_C_playerID,
+   field_1B_playerID, field_2B_playerID, field_3B_playerID,
+   field_SS_playerID,
+   field_LF_playerID, field_CF_playerID, field_RF_playerID
+FROM
+   event
+WHERE
+   (pitcherID=:player_id OR field_C_playerID=:player_id OR
+    field_1B_playerID=:player_id OR field_2B_playerID=:player_id OR field_3B_playerID=:player_id OR
+    field_SS_playerID=:player_id OR
+    field_LF_playerID=:player_id OR field_CF_playerID=:player_id OR field_RF_playerID=:player_id){filters}
+"""
+
+pitching_query = """
+SELECT
+   eventID, gameID, theplay, baserunning
+FROM
+   event
+WHERE
+   pitcherID=:player_id{filters}
+"""
+
+# one index lookup per role column, the union leaves each event only once however many roles the player had
+# the player's roles are worked out in sql rather than fetching every player id of every event
+all_roles_query = """
+SELECT
+   gameID, theplay, baserunning,
+   {batter}=:player_id,
+   CASE :player_id {runner} ELSE '' END,
+   {positions}
+FROM
+   event
+WHERE
+   rowid IN ({lookups})
+""".format(
+    batter=batter_column,
+    runner=' '.join("WHEN {} THEN '{}'".format(column, idx + 1) for idx, column in enumerate(runner_columns)),
+    positions=' || '.join("CASE {} WHEN :player_id THEN '{}' ELSE '' END".format(column, idx + 1)
+                          for idx, column in enumerate(fielder_columns)),
+    lookups=' UNION '.join('SELECT rowid FROM event WHERE {}=:player_id{{filters}}'.format(column)
+                           for column in role_columns),
+)
+
+season_query = """
+SELECT
+   theplay, baserunning,
+   {}
+FROM
+   event
+WHERE
+   1{{filters}}
+""".format(', '.join(role_columns))
+
+
 class Player:
     def __init__(self, player_id, cursor=None, year=None, month=None, day=None, game=None):
         self.id = player_id
@@ -915,13 +1103,38 @@ class Player:
         x += self.pitching.features()
         return x
 
-    def match_game(self, gameID):
-        _, _, month, day, game = parse_game_id(gameID)
-        # print('park: {}, year: {}, month: {}, day: {}'.format(park, year, month, day))
-        match_month = self.month is None or month == self.month
-        match_day = self.day is None or day == self.day
-        match_game = self.game is None or game == self.game
-        return match_month and match_day and match_game
+    def execute(self, cmd):
+        # year, month, day and game are all filtered in sql
+        filters, params = event_filters(self.year, self.month, self.day, self.game)
+        params['player_id'] = self.id
+        return self.cursor.execute(cmd.format(filters=filters), params)
+
+    def route(self, play, batter, runner, positions):
+        # count one parsed play for every role the player had in the event
+        # positions is a string of fielding positions 1-9, i.e. '1' for the pitcher
+        if batter:
+            self.batting.append(play)
+        elif runner:
+            # catch database errors where player is both a batter and runner
+            self.base_running.append(play, runner)
+
+        for position in positions:
+            self.fielding.append(play, position)
+
+        if positions.startswith('1'):
+            self.pitching.append(play)
+
+    def parse_all(self):
+        if self.cursor is None:
+            return
+
+        self.batting.reset()
+        self.base_running.reset()
+        self.fielding.reset()
+        self.pitching.reset()
+
+        for row in self.execute(all_roles_query):
+            self.route(play_cache.parse(row[1], row[2]), row[3], row[4], row[5])
 
     def parse_batting(self):
         if self.cursor is None:
@@ -929,23 +1142,11 @@ class Player:
 
         self.batting.reset()
 
-        cmd = """
-        SELECT
-           eventID, gameID, theplay, baserunning
-        FROM
-           event
-        WHERE
-           batterID='{}'
-        """.format(self.id)
-        if self.year is not None:
-            cmd += "AND theyear='{}'".format(self.year)
-
-        for row in self.cursor.execute(cmd):
-            if self.match_game(gameID=row[1]):
-                play = row[2]
-                base_running = row[3]
-                self.batting.parse(play, base_running)
-                # print(row)
+        for row in self.execute(batting_query):
+            play = row[2]
+            base_running = row[3]
+            self.batting.parse(play, base_running)
+            # print(row)
 
     def parse_base_running(self):
         if self.cursor is None:
@@ -953,38 +1154,26 @@ class Player:
 
         self.base_running.reset()
 
-        cmd = """
-        SELECT
-           eventID, gameID, batterID, runner_1b, runner_2b, runner_3b, theplay, baserunning
-        FROM
-           event
-        WHERE
-           (runner_1b='{}' OR runner_2b='{}' OR runner_3b='{}')
-        """.format(self.id, self.id, self.id)
-        if self.year is not None:
-            cmd += "AND theyear='{}'".format(self.year)
-
-        for row in self.cursor.execute(cmd):
-            if self.match_game(gameID=row[1]):
-                batterID = row[2]
-                # catch database errors where player is both a batter and runner
-                if batterID != self.id:
-                    runner_1b = row[3]
-                    runner_2b = row[4]
-                    runner_3b = row[5]
-                    the_play = row[6]
-                    base_running = row[7]
-
-                    if runner_1b == self.id:
-                        runner = '1'
-                    elif runner_2b == self.id:
-                        runner = '2'
-                    elif runner_3b == self.id:
-                        runner = '3'
-                    else:
-                        runner = ''
-                    self.base_running.parse(the_play, base_running, runner)
-                    # print(row)
+        for row in self.execute(base_running_query):
+            batterID = row[2]
+            # catch database errors where player is both a batter and runner
+            if batterID != self.id:
+                runner_1b = row[3]
+                runner_2b = row[4]
+                runner_3b = row[5]
+                the_play = row[6]
+                base_running = row[7]
+
+                if runner_1b == self.id:
+                    runner = '1'
+                elif runner_2b == self.id:
+                    runner = '2'
+                elif runner_3b == self.id:
+                    runner = '3'
+                else:
+                    runner = ''
+                self.base_running.parse(the_play, base_running, runner)
+                # print(row)
 
     def parse_fielding(self):
         if self.cursor is None:
@@ -1001,52 +1190,58 @@ class Player:
         # 8: center field
         # 9: right field
 
-        cmd = """
-        SELECT
-           eventID, gameID, theplay, baserunning,
-           pitcherID, field_C_playerID,
-           field_1B_playerID, field_2B_playerID, field_3B_playerID,
-           field_SS_playerID,
-           field_LF_playerID, field_CF_playerID, field_RF_playerID
-        FROM
-           event
-        WHERE
-           (pitcherID='{}' OR field_C_playerID='{}' OR
-            field_1B_playerID='{}' OR field_2B_playerID='{}' OR field_3B_playerID='{}' OR
-            field_SS_playerID='{}' OR
-            field_LF_playerID='{}' OR field_CF_playerID='{}' OR field_RF_playerID='{}')
-        """.format(*[self.id] * 9)
-        if self.year is not None:
-            cmd += "AND theyear='{}'".format(self.year)
-
-        for row in self.cursor.execute(cmd):
-            if self.match_game(gameID=row[1]):
-                the_play = row[2]
-                base_running = row[3]
-                # assume row[4:13] matches positions 1-9
-                for idx, fielder in enumerate(row[4:13]):
-                    if self.id == fielder:
-                        position = str(idx + 1)
-                        self.fielding.parse(the_play, base_running, position)
+        for row in self.execute(fielding_query):
+            the_play = row[2]
+            base_running = row[3]
+            # assume row[4:13] matches positions 1-9
+            for idx, fielder in enumerate(row[4:13]):
+                if self.id == fielder:
+                    position = str(idx + 1)
+                    self.fielding.parse(the_play, base_running, position)
 
     def parse_pitching(self):
         if self.cursor is None:
             return
 
-        cmd = """
-        SELECT
-           eventID, gameID, theplay, baserunning
-        FROM
-           event
-        WHERE
-          pitcherID='{}'
-        """.format(self.id)
-        if self.year is not None:
-            cmd += "AND theyear='{}'".format(self.year)
-
-        for row in self.cursor.execute(cmd):
-            if self.match_game(gameID=row[1]):
-                play = row[2]
-                base_running = row[3]
-                self.pitching.parse(play, base_running)
-                # print(row)
+        for row in self.execute(pitching_query):
+            play = row[2]
+            base_running = row[3]
+            self.pitching.parse(play, base_running)
+            # print(row)
+
+
+def parse_players(cursor, year=None, player_ids=None, month=None, day=None, game=None):
+    # stat lines for many players from one scan of the season's events, rather than a set of queries per player
+    # player_ids of None means every player appearing in the season
+    players = {}
+    if player_ids is not None:
+        for player_id in player_ids:
+            players[player_id] = Player(player_id, cursor, year=year, month=month, day=day, game=game)
+
+    filters, params = event_filters(year, month, day, game)
+
+    for row in cursor.execute(season_query.format(filters=filters), params):
+        # gather each player's roles in this event: batter flag, runner base and fielding positions
+        batter_id = row[2]
+        roles = {batter_id: [True, '', '']}
+        for runner, runner_id in zip('123', row[3:6]):
+            role = roles.setdefault(runner_id, [False, '', ''])
+            if not role[1]:
+                role[1] = runner
+        for position, fielder_id in zip('123456789', row[6:15]):
+            roles.setdefault(fielder_id, [False, '', ''])[2] += position
+        # empty runner columns
+        roles.pop('', None)
+
+        play = None
+        for player_id, (batter, runner, positions) in roles.items():
+            player = players.get(player_id)
+            if player is None:
+                if player_ids is not None:
+                    continue
+                player = players[player_id] = Player(player_id, cursor, year=year, month=month, day=day, game=game)
+            if play is None:
+                play = play_cache.parse(row[0], row[1])
+            player.route(play, batter, runner, positions)
+
+    return players
@@ -1,81 +1,175 @@
+import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, get_worker_info
+import os
+import pathlib
 import sqlite3
 
 
+# settings for the read only dataset connections
+read_pragmas = {
+    'query_only': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': -65536,  # negative sizes are in KiB, i.e. 64 MiB
+    'mmap_size': 1 << 30,
+}
+
+
+def connect_read_only(db_file):
+    # immutable skips locking and change detection, so the database must not be written while it is open
+    uri = '{}?mode=ro&immutable=1'.format(pathlib.Path(db_file).resolve().as_uri())
+    connection = sqlite3.connect(uri, uri=True)
+    for name, value in read_pragmas.items():
+        connection.execute('PRAGMA {} = {}'.format(name, value))
+    return connection
+
+
 class BaseballDataset(Dataset):
     def __init__(self, db_file):
         self.db_file = db_file
 
-        # connect to database and get cursor
-        self.connection = sqlite3.connect(db_file)
-        self.cursor = self.connection.cursor()
+        # each process opens its own connection on first use, see connect
+        self.connection = None
+        self.cursor = None
+        self.pid = None
+        cursor = self.connect()
 
-        cmd = 'SELECT game_id FROM game'
-        self.game_list = []
-        for row in self.cursor.execute(cmd):
-            game_id = row[0]
-            self.game_list.append(game_id)
+        # games are indexed in game id order by their integer rowid, read straight off the primary key index
+        # game ids are only read if game_list is used
+        self.game_ids = None
+        self.read_index(cursor, with_game_ids=False)
+
+        # features are either a column per feature or one packed float32 blob
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(game)')]
+        self.blob_features = 'features' in columns
 
         cmd = 'SELECT * FROM game'
-        first_row = self.cursor.execute(cmd).fetchone()
+        first_row = cursor.execute(cmd).fetchone()
         self.feature_index = 5
-        self.num_aggregate_feature = len(first_row[self.feature_index:])
+        if self.blob_features:
+            self.num_aggregate_feature = len(first_row[self.feature_index]) // np.dtype(np.float32).itemsize
+        else:
+            self.num_aggregate_feature = len(first_row[self.feature_index:])
 
         self.num_player = 18
         self.num_feature = self.num_aggregate_feature // self.num_player
 
         scaler_index = 2
         cmd = """SELECT * FROM scaler WHERE id=0 AND statistic='mu'"""
-        row = self.cursor.execute(cmd).fetchone()
+        row = cursor.execute(cmd).fetchone()
         self.mu = torch.tensor(row[scaler_index:])
 
         cmd = """SELECT * FROM scaler WHERE id=1 AND statistic='std'"""
-        row = self.cursor.execute(cmd).fetchone()
+        row = cursor.execute(cmd).fetchone()
         self.std = torch.tensor(row[scaler_index:])
 
+        # float32 views of the statistics for normalizing decoded blobs
+        self.mu_array = self.mu.numpy()
+        self.std_array = self.std.numpy()
+
+        # the metadata connection is not handed on to data loader workers
+        self.close()
+
+    def __getstate__(self):
+        # workers started by pickling the dataset open their own connection
+        state = self.__dict__.copy()
+        state['connection'] = None
+        state['cursor'] = None
+        state['pid'] = None
+        return state
+
     def __del__(self):
-        if self.connection:
+        self.close()
+
+    def connect(self):
+        # a connection is only used by the process that opened it, a forked worker opens its own
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = connect_read_only(self.db_file)
+            self.cursor = self.connection.cursor()
+            self.pid = os.getpid()
+        return self.cursor
+
+    def close(self):
+        if self.connection is not None and self.pid == os.getpid():
             self.connection.close()
+        self.connection = None
+        self.cursor = None
+        self.pid = None
+
+    def read_index(self, cursor, with_game_ids):
+        if with_game_ids:
+            rows = cursor.execute('SELECT rowid, game_id FROM game ORDER BY game_id').fetchall()
+            self.rowids = np.array([row[0] for row in rows], dtype=np.int64)
+            self.game_ids = [row[1] for row in rows]
+        else:
+            cmd = 'SELECT rowid FROM game ORDER BY game_id'
+            self.rowids = np.array([row[0] for row in cursor.execute(cmd)], dtype=np.int64)
+
+    @property
+    def game_list(self):
+        # game ids and rowids are read together so they always line up
+        if self.game_ids is None:
+            self.read_index(self.connect(), with_game_ids=True)
+        return self.game_ids
 
     def __len__(self):
-        return len(self.game_list)
+        return len(self.rowids)
+
+    def raw_features(self, row):
+        # unnormalized float32 features of a game row, a blob is decoded without copying
+        if self.blob_features:
+            return np.frombuffer(row[self.feature_index], dtype=np.float32)
+        return np.array(row[self.feature_index:], dtype=np.float32)
+
+    def decode_features(self, row):
+        features = torch.from_numpy((self.raw_features(row) - self.mu_array) / self.std_array)
+        return features.reshape(self.num_player, self.num_feature)
 
     def __getitem__(self, index):
         if index >= len(self):
             raise IndexError
 
-        cmd = 'SELECT * FROM game WHERE game_id=?'
-        game_id = self.game_list[index]
-        row = self.cursor.execute(cmd, [game_id]).fetchone()
-        assert row[0] == game_id
+        cmd = 'SELECT * FROM game WHERE rowid=?'
+        row = self.connect().execute(cmd, (int(self.rowids[index]),)).fetchone()
         # game_id = row[0]
         # game_datetime = row[1]
         # vis_score = row[2]
         # home_score = row[3]
         label = row[4]
-        features = (torch.tensor(row[self.feature_index:]) - self.mu) / self.std
-        features = features.reshape(self.num_player, self.num_feature)
+        features = self.decode_features(row)
 
         return features, label
 
-    def __getitems__(self, index_list):
-        game_id_list = [self.game_list[idx] for idx in index_list]
+    def fetch_batch(self, index_list):
+        # features of the whole batch as one (batch, num_player, num_feature) tensor in the order requested
+        rowid_list = self.rowids[index_list].tolist()
+
+        # sqlite returns the rows in its own order, and repeated games only once
+        cmd = 'SELECT rowid, * FROM game WHERE rowid IN ({})'.format(','.join(['?'] * len(rowid_list)))
+        rows = {row[0]: row[1:] for row in self.connect().execute(cmd, rowid_list)}
 
-        cmd = 'SELECT * FROM game WHERE game_id IN ({})'.format(','.join(['?'] * len(game_id_list)))
-        items = []
-        for row in self.cursor.execute(cmd, game_id_list):
-            assert row[0] in game_id_list
+        batch = np.empty((len(rowid_list), self.num_aggregate_feature), dtype=np.float32)
+        label_list = []
+        for idx, rowid in enumerate(rowid_list):
+            row = rows[rowid]
             # game_id = row[0]
             # game_datetime = row[1]
             # vis_score = row[2]
             # home_score = row[3]
-            label = row[4]
-            features = (torch.tensor(row[self.feature_index:]) - self.mu) / self.std
-            features = features.reshape(self.num_player, self.num_feature)
-            items.append((features, label))
+            label_list.append(row[4])
+            batch[idx] = self.raw_features(row)
 
-        return items
+        # normalize the batch in one go
+        batch -= self.mu_array
+        batch /= self.std_array
+        features = torch.from_numpy(batch).reshape(len(rowid_list), self.num_player, self.num_feature)
+        labels = torch.tensor(label_list)
+
+        return features, labels
+
+    def __getitems__(self, index_list):
+        features, labels = self.fetch_batch(index_list)
+        return list(zip(features, labels.tolist()))
 
     def fetch_all_data(self, max_count=None):
         feature_list = []
@@ -83,15 +177,14 @@ class BaseballDataset(Dataset):
 
         count = 0
         cmd = 'SELECT * FROM game'
-        for row in self.cursor.execute(cmd):
+        for row in self.connect().execute(cmd):
             # game_id = row[0]
             # game_datetime = row[1]
             # vis_score = row[2]
             # home_score = row[3]
             label = row[4]
             label_list.append(label)
-            features = (torch.tensor(row[self.feature_index:]) - self.mu) / self.std
-            features = features.reshape(self.num_player, self.num_feature)
+            features = self.decode_features(row)
             feature_list.append(features)
             count += 1
             if max_count is not None and count >= max_count:
@@ -103,8 +196,84 @@ class BaseballDataset(Dataset):
         return all_features, all_labels
 
 
+class ArrayDataset(Dataset):
+    # serves games exported by Pipeline.export from memory mapped .npy files, features are already normalized
+    def __init__(self, array_path):
+        self.array_path = array_path
+
+        # small arrays are read into memory, features are mapped on first use in each process
+        self.labels = np.load(os.path.join(array_path, 'labels.npy'))
+        self.game_list = np.load(os.path.join(array_path, 'game_ids.npy'))
+        self.datetimes = np.load(os.path.join(array_path, 'datetimes.npy'))
+        self.features = None
+
+        _, self.num_player, self.num_feature = self.mapped_features().shape
+        self.num_aggregate_feature = self.num_player * self.num_feature
+
+    def __getstate__(self):
+        # workers map the file themselves rather than receiving a pickled copy of every feature
+        state = self.__dict__.copy()
+        state['features'] = None
+        return state
+
+    def __len__(self):
+        return len(self.labels)
+
+    def mapped_features(self):
+        if self.features is None:
+            self.features = np.load(os.path.join(self.array_path, 'features.npy'), mmap_mode='r')
+        return self.features
+
+    def __getitem__(self, index):
+        if index >= len(self):
+            raise IndexError
+
+        # copy out of the read only map so the tensor owns writable memory
+        features = torch.from_numpy(np.array(self.mapped_features()[index]))
+        label = int(self.labels[index])
+
+        return features, label
+
+    def fetch_batch(self, index_list):
+        # one gather for the whole batch, in the order requested
+        index_list = np.asarray(index_list, dtype=np.int64)
+        features = torch.from_numpy(np.asarray(self.mapped_features()[index_list]))
+        labels = torch.from_numpy(self.labels[index_list])
+
+        return features, labels
+
+    def __getitems__(self, index_list):
+        features, labels = self.fetch_batch(index_list)
+        return list(zip(features, labels.tolist()))
+
+    def fetch_all_data(self, max_count=None):
+        features = self.mapped_features()[:max_count]
+
+        all_features = torch.from_numpy(np.array(features))
+        all_labels = torch.from_numpy(self.labels[:max_count].copy())
+
+        return all_features, all_labels
+
+
+def init_worker(worker_id):
+    # open each worker's connection as it starts rather than on its first batch
+    get_worker_info().dataset.connect()
+
+
 def load_data(db_file, num_workers=0, batch_size=128):
     dataset = BaseballDataset(db_file)
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=True,
+        num_workers=num_workers,
+        drop_last=True,
+        worker_init_fn=init_worker,
+    )
+
+
+def load_array_data(array_path, num_workers=0, batch_size=128):
+    dataset = ArrayDataset(array_path)
     return DataLoader(
         dataset,
         batch_size=batch_size,
@@ -0,0 +1,30 @@
+import sys
+import time
+import numpy as np
+from baseball.utils import BaseballDataset
+
+
+def batches_per_second(fetch, batches):
+    tic = time.time()
+    for index_list in batches:
+        fetch(index_list)
+    return len(batches) / (time.time() - tic)
+
+
+def main(db_file='../data/train.db', batch_size=128, num_batch=50):
+    # shuffled batches fetched item by item and with one query and one normalization per batch
+    batch_size = int(batch_size)
+    num_batch = int(num_batch)
+    dataset = BaseballDataset(db_file)
+    rng = np.random.default_rng(12345)
+    batches = [rng.choice(len(dataset), size=batch_size, replace=False).tolist() for _ in range(num_batch)]
+
+    per_item = batches_per_second(lambda index_list: [dataset[idx] for idx in index_list], batches)
+    per_batch = batches_per_second(dataset.__getitems__, batches)
+    print('batch size {}, {} batches'.format(batch_size, num_batch))
+    print('per item:   {:.1f} batches/s'.format(per_item))
+    print('per batch:  {:.1f} batches/s ({:.1f}x)'.format(per_batch, per_batch / per_item))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
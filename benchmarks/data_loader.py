@@ -0,0 +1,31 @@
+import sys
+import time
+from baseball.utils import load_data
+
+
+def epoch_time(db_file, num_workers, batch_size):
+    loader = load_data(db_file, num_workers=num_workers, batch_size=batch_size)
+    tic = time.time()
+    num_game = 0
+    for features, labels in loader:
+        num_game += len(labels)
+    return time.time() - tic, num_game
+
+
+def main(db_file='../data/train.db', batch_size=128, max_workers=8):
+    # one shuffled epoch per worker count, workers each read through their own read only connection
+    batch_size = int(batch_size)
+    max_workers = int(max_workers)
+    num_workers = 0
+    base = None
+    print('workers   epoch (s)   games/s   speedup')
+    while num_workers <= max_workers:
+        elapsed, num_game = epoch_time(db_file, num_workers, batch_size)
+        if base is None:
+            base = elapsed
+        print('{:>7} {:>11.3f} {:>9.0f} {:>8.2f}x'.format(num_workers, elapsed, num_game / elapsed, base / elapsed))
+        num_workers = 1 if num_workers == 0 else 2 * num_workers
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
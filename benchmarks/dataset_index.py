@@ -0,0 +1,45 @@
+import sqlite3
+import sys
+import time
+import numpy as np
+
+
+def main(db_file='../data/train.db', num_sample=20000):
+    # index games by game_id strings or by integer rowids, the startup read and random single game lookups
+    num_sample = int(num_sample)
+    con = sqlite3.connect(db_file)
+    cursor = con.cursor()
+
+    tic = time.time()
+    game_list = [row[0] for row in cursor.execute('SELECT game_id FROM game ORDER BY game_id')]
+    game_id_startup = time.time() - tic
+    game_id_bytes = sys.getsizeof(game_list) + sum(sys.getsizeof(game_id) for game_id in game_list)
+
+    tic = time.time()
+    rowids = np.array([row[0] for row in cursor.execute('SELECT rowid FROM game ORDER BY game_id')], dtype=np.int64)
+    rowid_startup = time.time() - tic
+
+    rng = np.random.default_rng(12345)
+    sample = rng.integers(len(rowids), size=num_sample)
+
+    tic = time.time()
+    for index in sample:
+        cursor.execute('SELECT * FROM game WHERE game_id=?', (game_list[index],)).fetchone()
+    game_id_latency = (time.time() - tic) / num_sample
+
+    tic = time.time()
+    for index in sample:
+        cursor.execute('SELECT * FROM game WHERE rowid=?', (int(rowids[index]),)).fetchone()
+    rowid_latency = (time.time() - tic) / num_sample
+    con.close()
+
+    print('{} games, {} random lookups'.format(len(rowids), num_sample))
+    print('index     startup (ms)   memory (KB)   lookup (us)')
+    print('game_id {:>14.1f} {:>13.1f} '
+          '{:>13.1f}'.format(1000 * game_id_startup, game_id_bytes / 1e3, 1e6 * game_id_latency))
+    print('rowid   {:>14.1f} {:>13.1f} '
+          '{:>13.1f}'.format(1000 * rowid_startup, rowids.nbytes / 1e3, 1e6 * rowid_latency))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
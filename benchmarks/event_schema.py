@@ -0,0 +1,38 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+from benchmarks.player_query import sample_players, query_latency
+from parse_season import main as parse_season
+
+
+def main(data_path='data/seasons', year='2022', num_player=20):
+    # ingest the same season files with and without the typed schema, then compare size and query latency
+    num_player = int(num_player)
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for typed_schema in (False, True):
+            db_file = os.path.join(temp_dir, 'typed.db' if typed_schema else 'untyped.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                parse_season(data_path=data_path, db_file=db_file, typed_schema=typed_schema)
+
+            con = sqlite3.connect(db_file)
+            cursor = con.cursor()
+            player_ids = sample_players(cursor, year, num_player)
+            results[typed_schema] = os.path.getsize(db_file), query_latency(cursor, player_ids, year)
+            con.close()
+
+    untyped_size, untyped_latency = results[False]
+    typed_size, typed_latency = results[True]
+    print('database size: untyped {:.1f} MB, typed {:.1f} MB'.format(untyped_size / 1e6, typed_size / 1e6))
+    print('query           untyped (ms)   typed (ms)   speedup')
+    for name in untyped_latency:
+        print('{:<15} {:>12.3f} {:>12.3f} {:>9.2f}x'.format(
+            name, 1000 * untyped_latency[name], 1000 * typed_latency[name],
+            untyped_latency[name] / typed_latency[name]))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,45 @@
+import csv
+import os
+import sys
+import time
+from baseball.player import Play
+from benchmarks.reference_play import Play as ReferencePlay
+
+
+def read_plays(rs):
+    plays = []
+    with open(rs) as csv_file:
+        reader = csv.DictReader(csv_file)
+        for event in reader:
+            plays.append((event['theplay'], event['baserunning']))
+    return plays
+
+
+def events_per_second(play, plays, num_repeat=5):
+    # best of several passes to smooth out timing noise
+    best = None
+    for _ in range(num_repeat):
+        tic = time.time()
+        for the_play, base_running in plays:
+            play.parse(the_play, base_running)
+        toc = time.time()
+        if best is None or toc - tic < best:
+            best = toc - tic
+    return len(plays) / best
+
+
+def main():
+    # time the play parser over every event of a season, i.e. python -m benchmarks.play_parse ../data/seasons/2022rs.csv
+    rs = sys.argv[1] if len(sys.argv) > 1 else os.path.join('..', 'data', 'seasons', '2022rs.csv')
+    plays = read_plays(rs)
+    print('parsing {} events from {}'.format(len(plays), rs))
+
+    before = events_per_second(ReferencePlay(), plays)
+    after = events_per_second(Play(), plays)
+    print('  reference parser: {:10.0f} events/s'.format(before))
+    print('  tokenized parser: {:10.0f} events/s'.format(after))
+    print('  speedup: {:.2f}x'.format(after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import sqlite3
+import sys
+import time
+from baseball.player import Player, batting_query, year_filter
+
+
+def formatted_batting(cursor, player_id, year):
+    # how the batting query used to be built, a new statement text for every player
+    cmd = """
+    SELECT
+       eventID, gameID, theplay, baserunning
+    FROM
+       event
+    WHERE
+       batterID='{}'
+    """.format(player_id)
+    cmd += "AND theyear='{}'".format(year)
+    return cursor.execute(cmd).fetchall()
+
+
+def prepared_batting(cursor, player_id, year):
+    cmd = batting_query.format(filters=year_filter)
+    return cursor.execute(cmd, {'player_id': player_id, 'year': year}).fetchall()
+
+
+def per_call(function, lookups):
+    # best of several passes, in microseconds per call
+    best = None
+    for _ in range(3):
+        tic = time.time()
+        for args in lookups:
+            function(*args)
+        toc = time.time()
+        if best is None or toc - tic < best:
+            best = toc - tic
+    return 1e6 * best / len(lookups)
+
+
+def main(db_file='seasons.db', year='2022', num_lookup=5000):
+    num_lookup = int(num_lookup)
+    con = sqlite3.connect(db_file)
+    cursor = con.cursor()
+
+    cmd = "SELECT DISTINCT batterID FROM event WHERE theyear=?"
+    player_ids = [row[0] for row in cursor.execute(cmd, (year,))]
+    lookups = [(cursor, player_ids[idx % len(player_ids)], year) for idx in range(num_lookup)]
+    print('{} sequential lookups over {} players from {}'.format(num_lookup, len(player_ids), year))
+
+    formatted = per_call(formatted_batting, lookups)
+    prepared = per_call(prepared_batting, lookups)
+    print('batting query, formatted sql: {:.1f} us/call'.format(formatted))
+    print('batting query, prepared sql:  {:.1f} us/call ({:.2f}x)'.format(prepared, formatted / prepared))
+
+    # lookups for ids with no events isolate the cost of preparing the statement, and unique ids keep the formatted
+    # text from being served by the connection's statement cache
+    empty_lookups = [(cursor, 'none{:06}'.format(idx), year) for idx in range(num_lookup)]
+    formatted = per_call(formatted_batting, empty_lookups)
+    prepared = per_call(prepared_batting, empty_lookups)
+    print('empty lookup, formatted sql:  {:.1f} us/call'.format(formatted))
+    print('empty lookup, prepared sql:   {:.1f} us/call ({:.2f}x)'.format(prepared, formatted / prepared))
+
+    def parse_all(cursor, player_id, year):
+        Player(player_id, cursor, year=year).parse_all()
+    print('Player.parse_all:             {:.1f} us/call'.format(per_call(parse_all, lookups)))
+
+    con.close()
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from baseball.player import Player
+from parse_season import create_indexes, event_indexes
+
+
+def sample_players(cursor, year, num_player):
+    cmd = "SELECT DISTINCT batterID FROM event WHERE theyear='{}' LIMIT {}".format(year, num_player)
+    return [row[0] for row in cursor.execute(cmd)]
+
+
+def query_latency(cursor, player_ids, year, num_repeat=3):
+    # best of several passes, reported as seconds per player for each kind of query
+    best = {}
+    for _ in range(num_repeat):
+        for name in ('batting', 'base_running', 'fielding', 'pitching'):
+            tic = time.time()
+            for player_id in player_ids:
+                player = Player(player_id, cursor, year=year)
+                getattr(player, 'parse_{}'.format(name))()
+            toc = time.time()
+            elapsed = (toc - tic) / len(player_ids)
+            if name not in best or elapsed < best[name]:
+                best[name] = elapsed
+    return best
+
+
+def main(db_file='seasons.db', year='2022', num_player=20):
+    num_player = int(num_player)
+    # work on a copy so the indexes can be dropped and rebuilt without touching the real database
+    with tempfile.TemporaryDirectory() as temp_dir:
+        copy_file = os.path.join(temp_dir, 'seasons.db')
+        source = sqlite3.connect(db_file)
+        con = sqlite3.connect(copy_file)
+        source.backup(con)
+        source.close()
+        cursor = con.cursor()
+
+        cmd = "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='event'"
+        for name in [row[0] for row in cursor.execute(cmd)]:
+            cursor.execute('DROP INDEX {}'.format(name))
+        con.commit()
+
+        player_ids = sample_players(cursor, year, num_player)
+        print('timing {} players from {}'.format(len(player_ids), year))
+        before = query_latency(cursor, player_ids, year)
+
+        tic = time.time()
+        header = [row[1] for row in cursor.execute('PRAGMA table_info(event)')]
+        create_indexes(cursor, event_indexes, header)
+        con.commit()
+        print('built indexes in {:.3f} s'.format(time.time() - tic))
+        after = query_latency(cursor, player_ids, year)
+        con.close()
+
+    print('query           no index (ms)   index (ms)   speedup')
+    for name in before:
+        print('{:<15} {:>13.3f} {:>12.3f} {:>9.1f}x'.format(
+            name, 1000 * before[name], 1000 * after[name], before[name] / after[name]))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
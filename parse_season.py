@@ -1,27 +1,177 @@
 import csv
+import hashlib
+from itertools import chain, islice
 from os import listdir
-from os.path import isfile, join
+from os.path import basename, getsize, isfile, join
+import re
 import sqlite3
 import time
 
 
-def main():
-    # get all the {year}rs.csv files from the data directory
-    data_path = 'data/seasons'
-    csv_list = [join(data_path, f) for f in listdir(data_path) if isfile(join(data_path, f))]
+# connection settings used only while bulk loading a new event table, a crash mid-load means re-running the
+# ingest anyway, but they are never used on an existing table where a crash could corrupt every loaded season
+bulk_pragmas = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': -262144,  # negative sizes are in KiB, i.e. 256 MiB
+}
+
+# defaults restored once the bulk load is finished
+default_pragmas = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+# player lookup indexes on the event table, one per column a Player query filters on, each paired with
+# theyear for the per-season queries
+event_indexes = {
+    'event_batter': ('batterID', 'theyear'),
+    'event_pitcher': ('pitcherID', 'theyear'),
+    'event_runner_1b': ('runner_1b', 'theyear'),
+    'event_runner_2b': ('runner_2b', 'theyear'),
+    'event_runner_3b': ('runner_3b', 'theyear'),
+    'event_field_c': ('field_C_playerID', 'theyear'),
+    'event_field_1b': ('field_1B_playerID', 'theyear'),
+    'event_field_2b': ('field_2B_playerID', 'theyear'),
+    'event_field_3b': ('field_3B_playerID', 'theyear'),
+    'event_field_ss': ('field_SS_playerID', 'theyear'),
+    'event_field_lf': ('field_LF_playerID', 'theyear'),
+    'event_field_cf': ('field_CF_playerID', 'theyear'),
+    'event_field_rf': ('field_RF_playerID', 'theyear'),
+    # whole seasons are scanned by parse_players and replaced by incremental ingest
+    'event_year': ('theyear',),
+}
+
+
+# columns always stored as text even when every value looks like a number, i.e. a play of '63'
+# any other column ending in ID is a player, team or game id and is text as well
+text_columns = {
+    'visteam',
+    'hometeam',
+    'runner_1b',
+    'runner_2b',
+    'runner_3b',
+    'theplay',
+    'baserunning',
+    'play_orig',
+}
+
+# columns always stored as integers
+integer_columns = {
+    'theyear',
+    'eventID',
+    'inning',
+    'visitor_or_home',
+    'outs',
+}
+
+# plain integers only, a leading zero means the value is a code rather than a number
+integer_pattern = re.compile(r'-?(0|[1-9][0-9]*)$')
+
+
+def infer_schema(csv_list, play_orig_index, header, num_row=10000):
+    # columns are INTEGER if every non-empty value in the first rows of every season file looks like an integer
+    # sqlite's integer affinity converts the text values as they are inserted, so a column has to fit every
+    # season, i.e. a code of '01' in a later season would silently become 1
+    candidates = [idx for idx, column in enumerate(header)
+                  if column not in text_columns and not column.endswith('ID') and column not in integer_columns]
+    seen = set()
+    for rs in csv_list:
+        if not candidates:
+            break
+        with open(rs, newline='') as csv_file:
+            for row in islice(read_rows(csv_file, play_orig_index, len(header)), num_row):
+                for idx in tuple(candidates):
+                    value = row[idx]
+                    if value:
+                        if integer_pattern.match(value):
+                            seen.add(idx)
+                        else:
+                            candidates.remove(idx)
+
+    integer_index = set(candidates) & seen
+    types = []
+    for idx, column in enumerate(header):
+        if column in integer_columns or idx in integer_index:
+            types.append('INTEGER')
+        else:
+            types.append('TEXT')
+    return types
 
-    # get the header from the first file, assume all headers are the same
-    with open(csv_list[0]) as csv_file:
+
+def set_pragmas(cur, pragmas):
+    for name, value in pragmas.items():
+        cur.execute('PRAGMA {} = {}'.format(name, value))
+
+
+def create_indexes(cur, indexes, header=None):
+    for name, columns in indexes.items():
+        # skip indexes on columns missing from this event table
+        if header is not None and not set(columns).issubset(header):
+            continue
+        cmd = 'CREATE INDEX IF NOT EXISTS {} ON event({})'.format(name, ', '.join(columns))
+        cur.execute(cmd)
+
+
+def file_digest(rs):
+    sha256 = hashlib.sha256()
+    with open(rs, 'rb') as season_file:
+        for block in iter(lambda: season_file.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def loaded_files(cur):
+    # name -> (size, sha256) of every season file already in the event table
+    cmd = """
+        CREATE TABLE IF NOT EXISTS
+            season_file(
+                name TEXT PRIMARY KEY,
+                size INTEGER,
+                sha256 TEXT,
+                theyear INTEGER
+            )
+    """
+    cur.execute(cmd)
+    return {name: (size, sha256) for name, size, sha256 in cur.execute('SELECT name, size, sha256 FROM season_file')}
+
+
+def read_header(rs):
+    # get the header from a season file
+    with open(rs, newline='') as csv_file:
         reader = csv.reader(csv_file)
         header = next(reader)
-        # remove second duplicate instance of 'play_orig'
-        play_orig_index = [idx for idx, col in enumerate(header) if col == 'play_orig']
-        play_orig_index = play_orig_index[-1]
-        header.pop(play_orig_index)
-        column_count = len(header)
+    # remove second duplicate instance of 'play_orig'
+    play_orig_index = [idx for idx, col in enumerate(header) if col == 'play_orig']
+    play_orig_index = play_orig_index[-1]
+    header.pop(play_orig_index)
+    return header, play_orig_index
+
+
+def read_rows(csv_file, play_orig_index, column_count, integer_index=()):
+    reader = csv.reader(csv_file)
+    next(reader)  # pop header
+    for row in reader:
+        row.pop(play_orig_index)
+        assert len(row) == column_count
+        # missing numbers are NULL rather than empty text
+        for idx in integer_index:
+            if not row[idx]:
+                row[idx] = None
+        yield row
+
+
+def main(data_path='data/seasons', db_file='seasons.db', bulk_load=True, chunk_size=20000, build_indexes=True,
+         defer_indexes=True, typed_schema=True, incremental=True, reparse_database=False):
+    # get all the {year}rs.csv files from the data directory
+    csv_list = sorted(join(data_path, f) for f in listdir(data_path) if isfile(join(data_path, f)))
+
+    # assume all headers are the same as the first file
+    header, play_orig_index = read_header(csv_list[0])
+    column_count = len(header)
 
     # connect to database and get cursor
-    con = sqlite3.connect("seasons.db")
+    con = sqlite3.connect(db_file)
     cur = con.cursor()
 
     # drop event table if it already exists
@@ -30,38 +180,145 @@ def main():
     event_exists = res.fetchone() is not None
     print('event exists: {}'.format(event_exists))
     if event_exists:
-        reparse_database = False
         if reparse_database:
-            cmd = 'DROP TABLE event'
-            cur.execute(cmd)
-        else:
-            print('event table already exists, exiting')
+            cur.execute('DROP TABLE event')
+            cur.execute('DROP TABLE IF EXISTS season_file')
+            con.commit()
+            event_exists = False
+        elif not incremental:
+            # tables ingested before the indexes existed only need the indexes added
+            if build_indexes:
+                print('event table already exists, building any missing indexes')
+                tic = time.time()
+                create_indexes(cur, event_indexes, header)
+                con.commit()
+                print('built indexes in {} s'.format(time.time() - tic))
+            else:
+                print('event table already exists, exiting')
+            con.close()
             return
 
-    # create new event table
-    cmd = 'CREATE TABLE event({})'.format(', '.join(header))
-    cur.execute(cmd)
+    # incremental loads into an existing table keep the default rollback journal
+    bulk_load = bulk_load and not event_exists
+    if bulk_load:
+        set_pragmas(cur, bulk_pragmas)
 
-    # insert each csv file into the event database
-    tic = time.time()
+    if event_exists:
+        # keep the column types of the existing table
+        columns = [(row[1], row[2]) for row in cur.execute('PRAGMA table_info(event)')]
+        assert [column for column, _ in columns] == header, 'season files do not match the event table'
+        integer_index = [idx for idx, (_, column_type) in enumerate(columns) if column_type == 'INTEGER']
+        if build_indexes:
+            # indexes are needed for replacing seasons, and are small updates for a season or two of rows
+            create_indexes(cur, event_indexes, header)
+    else:
+        # create new event table, typed so numbers are stored and compared as integers
+        if typed_schema:
+            types = infer_schema(csv_list, play_orig_index, header)
+            columns = ['{} {}'.format(column, column_type) for column, column_type in zip(header, types)]
+            integer_index = [idx for idx, column_type in enumerate(types) if column_type == 'INTEGER']
+        else:
+            columns = header
+            integer_index = []
+        cmd = 'CREATE TABLE event({})'.format(', '.join(columns))
+        cur.execute(cmd)
+        if build_indexes and not defer_indexes:
+            # indexes are maintained row by row during the insert, much slower than building them afterwards
+            create_indexes(cur, event_indexes, header)
+    con.commit()
+
+    # seasons whose files were removed from the data directory are removed from the event table too
+    loaded = loaded_files(cur)
+    csv_names = {basename(rs) for rs in csv_list}
+    for name in sorted(set(loaded) - csv_names):
+        year = cur.execute('SELECT theyear FROM season_file WHERE name=?', (name,)).fetchone()[0]
+        print('season file {} was removed, deleting season {}'.format(name, year))
+        if year is not None:
+            # text matches both a typed theyear column, by integer affinity, and an untyped one
+            cur.execute('DELETE FROM event WHERE theyear=?', (str(year),))
+        cur.execute('DELETE FROM season_file WHERE name=?', (name,))
+        con.commit()
+
+    # only load files that are new or changed since they were last loaded
+    pending = []
     for rs in csv_list:
+        name = basename(rs)
+        size = getsize(rs)
+        sha256 = file_digest(rs)
+        if loaded.get(name) == (size, sha256):
+            continue
+        pending.append((rs, name, size, sha256))
+    print('loading {} of {} season files'.format(len(pending), len(csv_list)))
+
+    # new seasons cannot change the column types of an existing table, warn where they no longer fit
+    if event_exists and pending and integer_index:
+        types = infer_schema([rs for rs, _, _, _ in pending], play_orig_index, header)
+        for idx in integer_index:
+            if types[idx] != 'INTEGER':
+                print('warning: column {} is INTEGER but new season files have non-integer values, '
+                      'reparse the database to store it as text'.format(header[idx]))
+
+    # use placeholders '?' to avoid sql injection attacks
+    insert_cmd = 'INSERT INTO event VALUES({})'.format(', '.join(['?'] * column_count))
+    year_index = header.index('theyear')
+
+    # insert each csv file into the event database, streaming rows in chunks within one transaction per file
+    read_time = 0.0
+    insert_time = 0.0
+    commit_time = 0.0
+    row_count = 0
+    tic = time.time()
+    for rs, name, size, sha256 in pending:
         print('inserting {}'.format(rs))
-        with open(rs) as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)  # pop header
-            data = []
-            for row in reader:
-                row.pop(play_orig_index)
-                assert len(row) == column_count
-                data.append(tuple(row))
-            # use placeholders '?' to avoid sql injection attacks
-            cmd = 'INSERT INTO event VALUES({})'.format(', '.join(['?'] * column_count))
-            cur.executemany(cmd, data)
-            con.commit()
+        with open(rs, newline='') as csv_file:
+            rows = read_rows(csv_file, play_orig_index, column_count, integer_index)
+            first_row = next(rows, None)
+            year = None if first_row is None else first_row[year_index]
+
+            # a changed season replaces all of that season's rows, in the same transaction as the new rows
+            if event_exists and year is not None:
+                cur.execute('DELETE FROM event WHERE theyear=?', (year,))
+
+            if first_row is not None:
+                rows = chain([first_row], rows)
+            while True:
+                t0 = time.time()
+                chunk = list(islice(rows, chunk_size))
+                t1 = time.time()
+                read_time += t1 - t0
+                if not chunk:
+                    break
+                cur.executemany(insert_cmd, chunk)
+                insert_time += time.time() - t1
+                row_count += len(chunk)
+
+        cmd = 'INSERT OR REPLACE INTO season_file VALUES(?, ?, ?, ?)'
+        cur.execute(cmd, (name, size, sha256, year))
+        t0 = time.time()
+        con.commit()
+        commit_time += time.time() - t0
+
+    # index once all rows are in place
+    t0 = time.time()
+    if build_indexes and defer_indexes and not event_exists:
+        create_indexes(cur, event_indexes, header)
+        con.commit()
+    index_time = time.time() - t0
+
+    if bulk_load:
+        set_pragmas(cur, default_pragmas)
     toc = time.time()
 
     # inserted all csv files in 144.3937029838562 s
     print('inserted all csv files in {} s'.format(toc - tic))
+    print('  rows:   {}'.format(row_count))
+    print('  read:   {:.3f} s'.format(read_time))
+    print('  insert: {:.3f} s'.format(insert_time))
+    print('  commit: {:.3f} s'.format(commit_time))
+    print('  index:  {:.3f} s'.format(index_time))
+
+    con.close()
+    print('database size: {:.1f} MB'.format(getsize(db_file) / 1e6))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 import sqlite3
-from player import Player
+from baseball.player import Player, parse_players
 
 
 def main():
@@ -26,6 +26,12 @@ def main():
     swanson.parse_fielding()
     swanson.fielding.print_stats()
 
+    # stat lines for every player in a season come from one scan rather than queries per player
+    players = parse_players(cur, year='2022')
+    leaders = sorted(players.values(), key=lambda p: p.batting.home_run, reverse=True)
+    for player in leaders[:10]:
+        print('{}\t{}'.format(player.id, player.batting.home_run))
+
 
 if __name__ == "__main__":
     main()
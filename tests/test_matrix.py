@@ -0,0 +1,111 @@
+import unittest
+import numpy as np
+from baseball.player import PlayCache, Player
+from baseball.matrix import EventMatrix, play_row, play_dtype, player_game_features, game_scores
+
+
+def make_event(the_play, base_running, batter, runners=('', '', ''), visitor_or_home='0'):
+    event = {
+        'visitor_or_home': visitor_or_home,
+        'batterID': batter,
+        'runner_1b': runners[0],
+        'runner_2b': runners[1],
+        'runner_3b': runners[2],
+        'theplay': the_play,
+        'baserunning': base_running,
+        'pitcherID': 'pitcher',
+        'field_C_playerID': 'catcher',
+        'field_1B_playerID': 'first',
+        'field_2B_playerID': 'second',
+        'field_3B_playerID': 'third',
+        'field_SS_playerID': 'short',
+        'field_LF_playerID': 'left',
+        'field_CF_playerID': 'center',
+        'field_RF_playerID': 'right',
+    }
+    return event
+
+
+class TestPlayRow(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = PlayCache()
+
+    def test_position_counts(self):
+        row = np.array([play_row(self.cache.parse('3(B)3(1)/LDP'))], dtype=play_dtype)[0]
+        self.assertEqual(2, row['put_out'][3])
+        self.assertEqual(0, row['assist'].sum())
+        self.assertEqual(1, row['double_play'])
+        self.assertEqual(2, row['num_out'])
+
+    def test_base_counts(self):
+        row = np.array([play_row(self.cache.parse('POCS2(1361)', '3-H;1-2'))], dtype=play_dtype)[0]
+        # POCS2 is a pick off and caught stealing for the runner on first
+        self.assertEqual(1, row['pick_off'][1])
+        self.assertEqual(1, row['caught_stealing'][1])
+        self.assertEqual(1, row['num_pick_off'])
+        self.assertEqual(1, row['score'][3])
+        self.assertEqual(1, row['advance'][0])
+
+
+class TestEventMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = PlayCache()
+        self.events = [
+            make_event('S8/G', '', 'bat00'),
+            make_event('64(1)3/GDP/G6', '', 'bat01', runners=('bat00', '', '')),
+            make_event('HR/F7', '2-H', 'bat02', runners=('', 'bat01', '')),
+            make_event('K+SB2', '', 'bat03', runners=('bat02', '', '')),
+            make_event('W', '', 'bat00', visitor_or_home='1'),
+        ]
+
+    def test_build(self):
+        matrix = EventMatrix(self.cache)
+        matrix.append_game('FOO202204070')
+        for event in self.events:
+            matrix.append(event)
+        events = matrix.build()
+
+        self.assertEqual(len(self.events), len(events))
+        self.assertEqual(5, len(matrix.play_rows))
+        self.assertEqual(-1, events['runner'][0, 1])
+        self.assertEqual(matrix.player_index['bat00'], events['runner'][1, 1])
+        self.assertEqual(matrix.player_index['pitcher'], events['fielder'][0, 1])
+
+        vis_score, home_score = game_scores(events, 1)
+        self.assertEqual(2, vis_score[0])
+        self.assertEqual(0, home_score[0])
+
+    def test_player_game_features(self):
+        matrix = EventMatrix(self.cache)
+        matrix.append_game('FOO202204070')
+        for event in self.events:
+            matrix.append(event)
+        events = matrix.build()
+        player_ids = matrix.player_ids()
+        games, players, features = player_game_features(events, len(player_ids))
+        actual = {player_ids[player]: list(row) for player, row in zip(players, features)}
+        self.assertTrue(np.all(games == 0))
+
+        # accumulate the same events one by one with the stat classes
+        expected = {}
+        for event in self.events:
+            play = self.cache.parse(event['theplay'], event['baserunning'])
+            expected.setdefault(event['batterID'], Player(event['batterID'])).batting.append(play)
+            for runner, label in (('1', 'runner_1b'), ('2', 'runner_2b'), ('3', 'runner_3b')):
+                if event[label] != '':
+                    expected.setdefault(event[label], Player(event[label])).base_running.append(play, runner)
+            for position, label in enumerate(('pitcherID', 'field_C_playerID', 'field_1B_playerID',
+                                              'field_2B_playerID', 'field_3B_playerID', 'field_SS_playerID',
+                                              'field_LF_playerID', 'field_CF_playerID', 'field_RF_playerID')):
+                expected.setdefault(event[label], Player(event[label])).fielding.append(play, str(position + 1))
+            expected.setdefault(event['pitcherID'], Player(event['pitcherID'])).pitching.append(play)
+
+        self.assertEqual(set(expected), set(actual))
+        for player_id, player in expected.items():
+            self.assertEqual(player.features(), actual[player_id], msg=player_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
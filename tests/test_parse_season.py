@@ -0,0 +1,190 @@
+import unittest
+import sqlite3
+import os
+import csv
+import tempfile
+from parse_season import main, infer_schema, read_header
+
+
+class TestParseSeason(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.temp_dir.name, 'seasons')
+        os.mkdir(self.data_path)
+        self.db_file = os.path.join(self.temp_dir.name, 'seasons.db')
+
+        header = ['gameID', 'theyear', 'play_orig', 'theplay', 'play_orig', 'batterID']
+        self.expected = []
+        for year in (2021, 2022):
+            with open(os.path.join(self.data_path, '{}rs.csv'.format(year)), 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(header)
+                for idx in range(5):
+                    game_id = 'ANA{}04070'.format(year)
+                    the_play = 'S{}'.format(idx + 1)
+                    writer.writerow([game_id, str(year), the_play, the_play, 'dup', 'troum001'])
+                    self.expected.append((game_id, year, the_play, the_play, 'troum001'))
+
+    def test_main(self):
+        # small chunks so each file is inserted over several executemany calls
+        main(data_path=self.data_path, db_file=self.db_file, chunk_size=2)
+
+        con = sqlite3.connect(self.db_file)
+        cur = con.cursor()
+        columns = [row[1] for row in cur.execute('PRAGMA table_info(event)')]
+        self.assertEqual(['gameID', 'theyear', 'play_orig', 'theplay', 'batterID'], columns)
+        rows = cur.execute('SELECT * FROM event ORDER BY rowid').fetchall()
+        self.assertEqual(self.expected, rows)
+
+        # only indexes on columns in this table are built
+        self.assertEqual(['event_batter', 'event_year'], self.index_names(cur))
+        con.close()
+
+        # rerunning with the same files loads nothing new
+        main(data_path=self.data_path, db_file=self.db_file)
+        con = sqlite3.connect(self.db_file)
+        self.assertEqual(len(self.expected), con.execute('SELECT COUNT(*) FROM event').fetchone()[0])
+        con.close()
+
+    def test_indexes(self):
+        main(data_path=self.data_path, db_file=self.db_file, build_indexes=False)
+        con = sqlite3.connect(self.db_file)
+        self.assertEqual([], self.index_names(con.cursor()))
+        con.close()
+
+        # rerunning on an existing table adds the missing indexes
+        main(data_path=self.data_path, db_file=self.db_file)
+        con = sqlite3.connect(self.db_file)
+        cur = con.cursor()
+        self.assertEqual(['event_batter', 'event_year'], self.index_names(cur))
+        plan = cur.execute("EXPLAIN QUERY PLAN SELECT * FROM event WHERE batterID='troum001' AND theyear='2022'")
+        self.assertIn('event_batter', ' '.join(row[-1] for row in plan))
+        con.close()
+
+    def test_indexes_not_deferred(self):
+        main(data_path=self.data_path, db_file=self.db_file, defer_indexes=False)
+        con = sqlite3.connect(self.db_file)
+        cur = con.cursor()
+        self.assertEqual(['event_batter', 'event_year'], self.index_names(cur))
+        self.assertEqual(len(self.expected), cur.execute('SELECT COUNT(*) FROM event').fetchone()[0])
+        con.close()
+
+    def write_season(self, year, plays):
+        with open(os.path.join(self.data_path, '{}rs.csv'.format(year)), 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['gameID', 'theyear', 'play_orig', 'theplay', 'play_orig', 'batterID'])
+            for the_play in plays:
+                writer.writerow(['ANA{}04070'.format(year), str(year), the_play, the_play, 'dup', 'troum001'])
+
+    def season_rows(self):
+        con = sqlite3.connect(self.db_file)
+        cmd = 'SELECT theyear, COUNT(*) FROM event GROUP BY theyear ORDER BY theyear'
+        rows = con.execute(cmd).fetchall()
+        con.close()
+        return rows
+
+    def test_incremental(self):
+        main(data_path=self.data_path, db_file=self.db_file)
+        self.assertEqual([(2021, 5), (2022, 5)], self.season_rows())
+
+        # a changed season replaces just its own rows, a new season is added
+        self.write_season(2022, ['K', 'W'])
+        self.write_season(2023, ['HR'])
+        main(data_path=self.data_path, db_file=self.db_file)
+        self.assertEqual([(2021, 5), (2022, 2), (2023, 1)], self.season_rows())
+
+        con = sqlite3.connect(self.db_file)
+        plays = con.execute('SELECT theplay FROM event WHERE theyear=2022 ORDER BY rowid').fetchall()
+        self.assertEqual([('K',), ('W',)], plays)
+        files = con.execute('SELECT name, theyear FROM season_file ORDER BY name').fetchall()
+        self.assertEqual([('2021rs.csv', 2021), ('2022rs.csv', 2022), ('2023rs.csv', 2023)], files)
+        con.close()
+
+    def test_incremental_removed_season(self):
+        main(data_path=self.data_path, db_file=self.db_file)
+        os.remove(os.path.join(self.data_path, '2021rs.csv'))
+        main(data_path=self.data_path, db_file=self.db_file)
+        self.assertEqual([(2022, 5)], self.season_rows())
+
+        con = sqlite3.connect(self.db_file)
+        files = con.execute('SELECT name FROM season_file').fetchall()
+        self.assertEqual([('2022rs.csv',)], files)
+        con.close()
+
+    def test_incremental_removed_season_untyped(self):
+        # theyear is stored as text in an untyped event table
+        main(data_path=self.data_path, db_file=self.db_file, typed_schema=False)
+        os.remove(os.path.join(self.data_path, '2021rs.csv'))
+        main(data_path=self.data_path, db_file=self.db_file)
+        self.assertEqual([('2022', 5)], self.season_rows())
+
+    def test_incremental_without_metadata(self):
+        # event tables loaded before season files were tracked are reloaded season by season without duplicates
+        main(data_path=self.data_path, db_file=self.db_file)
+        con = sqlite3.connect(self.db_file)
+        con.execute('DROP TABLE season_file')
+        con.commit()
+        con.close()
+
+        main(data_path=self.data_path, db_file=self.db_file)
+        self.assertEqual([(2021, 5), (2022, 5)], self.season_rows())
+
+    def test_reparse_database(self):
+        main(data_path=self.data_path, db_file=self.db_file)
+        self.write_season(2021, ['K'])
+        main(data_path=self.data_path, db_file=self.db_file, incremental=False)
+        self.assertEqual([(2021, 5), (2022, 5)], self.season_rows())
+
+        main(data_path=self.data_path, db_file=self.db_file, reparse_database=True)
+        self.assertEqual([(2021, 1), (2022, 5)], self.season_rows())
+
+    def test_typed_schema(self):
+        rs = os.path.join(self.temp_dir.name, '2022rs.csv')
+        header = ['gameID', 'theyear', 'inning', 'theplay', 'play_orig', 'play_orig', 'balls', 'count', 'note']
+        with open(rs, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(header)
+            writer.writerow(['ANA202204070', '2022', '1', '63', '63', 'dup', '3', '12', '3'])
+            writer.writerow(['ANA202204070', '2022', '1', '8', '8', 'dup', '', '01', 'a'])
+
+        columns, play_orig_index = read_header(rs)
+        types = infer_schema([rs], play_orig_index, columns)
+        # plays stay text even when every play is a number, and codes with leading zeros are not numbers
+        expected = ['TEXT', 'INTEGER', 'INTEGER', 'TEXT', 'TEXT', 'INTEGER', 'TEXT', 'TEXT']
+        self.assertEqual(expected, types)
+
+        # every season file is sampled, a code in a later season keeps the column text
+        later_rs = os.path.join(self.temp_dir.name, '2023rs.csv')
+        with open(later_rs, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(header)
+            writer.writerow(['ANA202304070', '2023', '1', '63', '63', 'dup', '01', '12', '3'])
+        types = infer_schema([rs, later_rs], play_orig_index, columns)
+        expected = ['TEXT', 'INTEGER', 'INTEGER', 'TEXT', 'TEXT', 'TEXT', 'TEXT', 'TEXT']
+        self.assertEqual(expected, types)
+        os.remove(later_rs)
+
+        data_path = os.path.join(self.temp_dir.name, 'typed')
+        os.mkdir(data_path)
+        os.rename(rs, os.path.join(data_path, '2022rs.csv'))
+        main(data_path=data_path, db_file=self.db_file)
+        con = sqlite3.connect(self.db_file)
+        cur = con.cursor()
+        rows = cur.execute('SELECT theyear, inning, theplay, balls, count FROM event ORDER BY rowid').fetchall()
+        self.assertEqual([(2022, 1, '63', 3, '12'), (2022, 1, '8', None, '01')], rows)
+        # text parameters still match integer columns
+        self.assertEqual(2, cur.execute('SELECT COUNT(*) FROM event WHERE theyear=?', ('2022',)).fetchone()[0])
+        con.close()
+
+    @staticmethod
+    def index_names(cur):
+        cmd = "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='event' ORDER BY name"
+        return [row[0] for row in cur.execute(cmd)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,11 @@ import collections
 import unittest
 import sqlite3
 import os
+import csv
+import tempfile
 import numpy as np
-from baseball.pipeline import StandardScaler, Lineup, LineupParser, Pipeline
+from baseball.pipeline import (StandardScaler, PrefixSum, Lineup, LineupParser, Pipeline, Event, event_columns,
+                               read_events)
 
 
 class TestStandardScaler(unittest.TestCase):
@@ -41,6 +44,132 @@ class TestStandardScaler(unittest.TestCase):
             self.assertAlmostEqual(expected_mu[idx], actual_mu[idx])
             self.assertAlmostEqual(expected_std[idx], actual_std[idx])
 
+    def test_update_many(self):
+        x = self.rng.random((self.num_sample, self.num_feature))
+        for sample in x[:2]:
+            self.scaler.update(list(sample))
+        self.scaler.update_many(x[2:])
+        self.scaler.update_many(x[:0])
+
+        self.assertEqual(self.num_sample, self.scaler.count)
+        actual_mu, actual_std = self.scaler.calculate_statistics()
+        np.testing.assert_allclose(x.mean(axis=0), actual_mu)
+        np.testing.assert_allclose(x.std(axis=0), actual_std)
+        np.testing.assert_allclose(x.sum(axis=0), self.scaler.sum1)
+        np.testing.assert_allclose((x * x).sum(axis=0), self.scaler.sum2)
+
+    def test_merge(self):
+        x = self.rng.random((3 * self.num_sample, self.num_feature))
+        seasons = [StandardScaler(num_feature=self.num_feature) for _ in range(3)]
+        for season, samples in zip(seasons, np.split(x, 3)):
+            season.update_many(samples)
+        for season in seasons:
+            self.scaler.merge(season)
+        self.scaler.merge(StandardScaler(num_feature=self.num_feature))
+
+        self.assertEqual(len(x), self.scaler.count)
+        actual_mu, actual_std = self.scaler.calculate_statistics()
+        np.testing.assert_allclose(x.mean(axis=0), actual_mu)
+        np.testing.assert_allclose(x.std(axis=0), actual_std)
+
+    def test_state(self):
+        x = self.rng.random((self.num_sample, self.num_feature))
+        self.scaler.update_many(x)
+        restored = StandardScaler(num_feature=self.num_feature)
+        restored.restore(self.scaler.state())
+
+        self.assertEqual(self.scaler.count, restored.count)
+        np.testing.assert_array_equal(self.scaler.mean, restored.mean)
+        np.testing.assert_array_equal(self.scaler.m2, restored.m2)
+
+    def test_large_offset(self):
+        # small spread on top of large career totals loses all precision with sum of squares
+        x = 1e9 + self.rng.random((1000, self.num_feature))
+        self.scaler.update_many(x[:500])
+        for sample in x[500:]:
+            self.scaler.update(sample)
+
+        actual_mu, actual_std = self.scaler.calculate_statistics()
+        np.testing.assert_allclose(x.mean(axis=0), actual_mu)
+        np.testing.assert_allclose(x.std(axis=0), actual_std, rtol=1e-6)
+
+
+class TestPrefixSum(unittest.TestCase):
+
+    def setUp(self):
+        self.num_feature = 3
+        self.prefix_sum = PrefixSum(num_feature=self.num_feature, capacity=2)
+        self.rng = np.random.default_rng(12345)
+
+    def test_add(self):
+        expected = collections.defaultdict(lambda: np.zeros(self.num_feature))
+        player_ids = ['p{}'.format(idx) for idx in range(7)]
+        for _ in range(20):
+            game_players = list(self.rng.choice(player_ids, size=4, replace=False))
+            features = self.rng.random((len(game_players), self.num_feature))
+            self.prefix_sum.add(game_players, features)
+            for player_id, player_features in zip(game_players, features):
+                expected[player_id] += player_features
+
+        # capacity grew past the initial two rows
+        self.assertEqual(len(expected), len(self.prefix_sum))
+        self.assertGreaterEqual(len(self.prefix_sum.sums), len(expected))
+        for player_id, player_features in expected.items():
+            self.assertIn(player_id, self.prefix_sum)
+            np.testing.assert_array_equal(player_features, self.prefix_sum[player_id])
+
+    def test_state(self):
+        self.prefix_sum.add(['a', 'b', 'c'], self.rng.random((3, self.num_feature)))
+        restored = PrefixSum(num_feature=self.num_feature)
+        restored.restore(self.prefix_sum.state())
+
+        self.assertEqual(self.prefix_sum.player_index, restored.player_index)
+        for player_id in ('a', 'b', 'c'):
+            np.testing.assert_array_equal(self.prefix_sum[player_id], restored[player_id])
+
+        # new players keep getting the next free row
+        restored.add(['d'], [[1, 2, 3]])
+        self.assertEqual(3, restored.player_index['d'])
+
+    def test_gather(self):
+        self.prefix_sum.add(['a', 'b'], [[1, 2, 3], [4, 5, 6]])
+        actual = self.prefix_sum.gather(['b', 'new', 'a'])
+        np.testing.assert_array_equal([[4, 5, 6], [0, 0, 0], [1, 2, 3]], actual)
+
+        # reading unseen players does not add them
+        self.assertNotIn('new', self.prefix_sum)
+        self.assertEqual(2, len(self.prefix_sum))
+        self.assertEqual(['a', 'b'], self.prefix_sum.state()['prefix_sum_player_ids'].tolist())
+
+
+class TestEvent(unittest.TestCase):
+
+    def test_read_events(self):
+        header = ['inning'] + list(reversed(event_columns)) + ['outs']
+        row = ['1'] + ['value_{}'.format(column) for column in reversed(event_columns)] + ['0']
+        lines = [','.join(header), ','.join(row)]
+
+        events = list(read_events(lines))
+        self.assertEqual(1, len(events))
+        event = events[0]
+        self.assertTrue(isinstance(event, Event))
+        self.assertEqual(len(event_columns), len(event))
+        for idx, column in enumerate(event_columns):
+            self.assertEqual('value_{}'.format(column), event[column])
+            self.assertEqual('value_{}'.format(column), getattr(event, column))
+            self.assertEqual('value_{}'.format(column), event[idx])
+
+    def test_lineup_parser_append(self):
+        values = {column: '{}00'.format(column) for column in event_columns}
+        values['visitor_or_home'] = '0'
+        parser = LineupParser()
+        parser.append(Event(**values))
+
+        self.assertEqual('visteam00', parser.visitor.team_key)
+        self.assertEqual(['batterID00'], parser.visitor.batters)
+        self.assertEqual('pitcherID00', parser.home.fielders['pitcherID'])
+        self.assertEqual('field_RF_playerID00', parser.home.fielders['field_RF_playerID'])
+
 
 class TestLineup(unittest.TestCase):
 
@@ -239,6 +368,24 @@ class TestLineupParser(unittest.TestCase):
         self.assertIn(team_key, self.parser.bullpen)
         self.assertEqual(expected, list(self.parser.bullpen[team_key]))
 
+    def test_state(self):
+        parser = LineupParser(use_bullpen=True)
+        parser.update_bullpen('ANA', ['p{}'.format(idx) for idx in range(7)])
+        parser.update_bullpen('HOU', ['p8', 'p9'])
+
+        restored = LineupParser(use_bullpen=True)
+        restored.restore(parser.state())
+        self.assertEqual(parser.bullpen, restored.bullpen)
+        self.assertEqual(parser.get_bullpen('HOU'), restored.get_bullpen('HOU'))
+
+        # restored bullpens keep rolling over
+        restored.update_bullpen('ANA', ['p10'])
+        self.assertEqual(['p3', 'p4', 'p5', 'p6', 'p10'], restored.get_bullpen('ANA'))
+
+        empty = LineupParser(use_bullpen=True)
+        empty.restore(LineupParser(use_bullpen=True).state())
+        self.assertEqual({}, empty.bullpen)
+
     def test_get_bullpen_not_full(self):
         self.parser.use_bullpen = True
         team_key = 'FOO'
@@ -619,6 +766,38 @@ class TestLineupParser(unittest.TestCase):
 
         self.assertEqual(expected, self.parser.fetch())
 
+    def test_snapshot_resolve(self):
+        fielders = {
+            'pitcherID': 'vis_pitcher',
+            'field_C_playerID': 'vis_catcher',
+            'field_1B_playerID': 'vis_first',
+            'field_2B_playerID': 'vis_second',
+            'field_3B_playerID': 'vis_third',
+            'field_SS_playerID': 'vis_short',
+            'field_LF_playerID': 'vis_left',
+            'field_CF_playerID': 'vis_center',
+            'field_RF_playerID': 'vis_right',
+        }
+        serial = LineupParser(use_bullpen=True)
+        deferred = LineupParser(use_bullpen=True)
+
+        for game in range(3):
+            for parser in (serial, deferred):
+                parser.reset()
+                parser.visitor.team_key = 'VIS'
+                parser.visitor.fielders = dict(fielders)
+                parser.visitor.pitchers = {'vis_pitcher': True, 'vis_rel{:02}'.format(game): True}
+                parser.home.team_key = 'HOM'
+                parser.home.fielders = {key: value.replace('vis', 'home') for key, value in fielders.items()}
+                parser.home.pitchers = {'home_pitcher': True}
+
+            snapshot = deferred.snapshot()
+            # snapshots don't touch the bullpen until they are resolved
+            self.assertNotIn('vis_rel{:02}'.format(game), deferred.bullpen.get('VIS', []))
+            self.assertEqual(serial.fetch(), deferred.resolve(snapshot))
+
+        self.assertEqual(list(serial.bullpen['VIS']), list(deferred.bullpen['VIS']))
+
 
 class TestPipeline(unittest.TestCase):
 
@@ -640,6 +819,40 @@ class TestPipeline(unittest.TestCase):
         result = self.pipeline.extract(2022)
         self.assertEqual(2430, len(result))
 
+    def test_extract_games(self):
+        expected = self.pipeline.extract(2022)
+        num_game = 0
+        for game_id, game_events in self.pipeline.extract_games(2022):
+            self.assertEqual(expected[game_id], game_events)
+            num_game += 1
+        self.assertEqual(2430, num_game)
+
+    def test_extract_games_grouping(self):
+        with tempfile.TemporaryDirectory() as season_path:
+            with open(os.path.join(season_path, '2022rs.csv'), 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                header = ['inning'] + list(event_columns)
+                writer.writerow(header)
+                for game_id, the_play in (('ANA202204070', 'S8'), ('ANA202204070', 'K'), ('ANA202204080', 'W'),
+                                          ('HOU202204070', 'HR'), ('HOU202204070', '63')):
+                    row = {column: '' for column in header}
+                    row['gameID'] = game_id
+                    row['theplay'] = the_play
+                    writer.writerow([row[column] for column in header])
+
+            self.pipeline.season_path = season_path
+            games = self.pipeline.extract_games(2022)
+
+            # games are yielded lazily, one at a time
+            game_id, game_events = next(games)
+            self.assertEqual('ANA202204070', game_id)
+            self.assertEqual(['S8', 'K'], [event['theplay'] for event in game_events])
+
+            remaining = [(game_id, len(game_events)) for game_id, game_events in games]
+            self.assertEqual([('ANA202204080', 1), ('HOU202204070', 2)], remaining)
+
+            self.assertEqual([], list(self.pipeline.extract_games(1900)))
+
     def test_transform_angels_april_07_2022(self):
         data = self.pipeline.extract(2022)
         gameID = 'ANA202204070'
@@ -853,6 +1066,22 @@ class TestPipeline(unittest.TestCase):
         self.assertEqual(111, home_win + away_win)
         self.assertEqual(51, home_loss + away_loss)
 
+    def test_transform_matrix(self):
+        data = self.pipeline.extract(2022)
+        expected = {game_id: self.pipeline.transform(game) for game_id, game in data.items()}
+
+        matrix_pipeline = Pipeline(use_matrix=True)
+        actual = matrix_pipeline.transform_matrix(data.items())
+
+        self.assertEqual(list(expected.keys()), list(actual.keys()))
+        for game_id, (players, game_result, starting_lineup) in expected.items():
+            actual_players, actual_game_result, actual_starting_lineup = actual[game_id]
+            self.assertEqual(game_result, actual_game_result)
+            self.assertEqual(starting_lineup, actual_starting_lineup)
+            self.assertEqual(set(players.keys()), set(actual_players.keys()))
+            for player_id, player in players.items():
+                self.assertEqual(player.features(), list(actual_players[player_id]))
+
     def test_load(self):
         # connect to database and get cursor
         con = sqlite3.connect(':memory:')
@@ -930,6 +1159,363 @@ class TestPipeline(unittest.TestCase):
         if os.path.exists(db_file):
             os.remove(db_file)
 
+    def test_process_parallel(self):
+        serial_file = 'test_process_serial.db'
+        parallel_file = 'test_process_parallel.db'
+        for db_file in (serial_file, parallel_file):
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+        self.pipeline.db_file = serial_file
+        self.pipeline.lo_year, self.pipeline.hi_year = 2021, 2022
+        self.pipeline.process()
+
+        parallel = Pipeline(num_workers=2)
+        parallel.db_file = parallel_file
+        parallel.lo_year, parallel.hi_year = 2021, 2022
+        parallel.process()
+
+        # parallel mode must produce bit identical tables
+        serial_con = sqlite3.connect(serial_file)
+        parallel_con = sqlite3.connect(parallel_file)
+        for cmd in ('SELECT * FROM game ORDER BY rowid', 'SELECT * FROM scaler ORDER BY id'):
+            expected = serial_con.execute(cmd).fetchall()
+            actual = parallel_con.execute(cmd).fetchall()
+            self.assertTrue(len(expected) > 0)
+            self.assertEqual(expected, actual)
+
+        # clean up
+        serial_con.close()
+        parallel_con.close()
+        for db_file in (serial_file, parallel_file):
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+    def test_save_load_state(self):
+        con = sqlite3.connect(':memory:')
+        self.assertIsNone(self.pipeline.load_state(con))
+
+        rng = np.random.default_rng(12345)
+        self.pipeline.prefix_sum.add(['a', 'b'], rng.random((2, self.pipeline.num_feature)))
+        self.pipeline.scaler.update_many(rng.random((3, self.pipeline.num_aggregate_feature)))
+        self.pipeline.save_state(con, 2021)
+
+        restored = Pipeline()
+        self.assertEqual(2021, restored.load_state(con))
+        self.assertEqual(self.pipeline.prefix_sum.player_index, restored.prefix_sum.player_index)
+        np.testing.assert_array_equal(self.pipeline.prefix_sum['b'], restored.prefix_sum['b'])
+        self.assertEqual(self.pipeline.scaler.count, restored.scaler.count)
+        np.testing.assert_array_equal(self.pipeline.scaler.m2, restored.scaler.m2)
+        con.close()
+
+    def test_load_checkpoint(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_file = os.path.join(temp_dir, 'checkpoint.db')
+            con = sqlite3.connect(db_file)
+            self.assertFalse(self.pipeline.has_games(con))
+
+            starting_lineup = {'p{:02}'.format(idx): idx for idx in range(self.pipeline.num_player)}
+            game_result = {'vis_score': 1, 'home_score': 2, 'result': 1}
+            game_data = {'ANA202204070': ({}, game_result, starting_lineup)}
+            self.pipeline.load(con, game_data, 2022)
+            con.close()
+
+            # games and checkpoint were committed together
+            con = sqlite3.connect(db_file)
+            self.assertTrue(self.pipeline.has_games(con))
+            self.assertEqual(2022, Pipeline().load_state(con))
+            self.assertEqual(1, con.execute('SELECT COUNT(*) FROM game').fetchone()[0])
+            con.close()
+
+    def test_load_blob_features(self):
+        starting_lineup = {'p{:02}'.format(idx): idx for idx in range(self.pipeline.num_player)}
+        game_result = {'vis_score': 1, 'home_score': 2, 'result': 1}
+        # the first game's player features show up in the second game's career features
+        players = {'p00': np.arange(1, self.pipeline.num_feature + 1, dtype=float) / 3}
+        game_data = {
+            'ANA202204070': (players, game_result, starting_lineup),
+            'ANA202204080': ({}, game_result, starting_lineup),
+        }
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            rows = {}
+            for blob_features in (False, True):
+                db_file = os.path.join(temp_dir, 'blob_{}.db'.format(blob_features))
+                con = sqlite3.connect(db_file)
+                Pipeline(blob_features=blob_features).load(con, game_data, 2022)
+                rows[blob_features] = con.execute('SELECT * FROM game ORDER BY game_id').fetchall()
+                columns = [row[1] for row in con.execute('PRAGMA table_info(game)')]
+                con.close()
+            self.assertEqual(['game_id', 'datetime', 'vis_score', 'home_score', 'result', 'features'], columns)
+
+            for column_row, blob_row in zip(rows[False], rows[True]):
+                self.assertEqual(column_row[:5], blob_row[:5])
+                features = np.frombuffer(blob_row[5], dtype=np.float32)
+                self.assertEqual(self.pipeline.num_player * self.pipeline.num_feature, len(features))
+                np.testing.assert_array_equal(np.float32(column_row[5:]), features)
+            self.assertTrue(np.frombuffer(rows[True][1][5], dtype=np.float32).any())
+
+    def test_load_feature_types(self):
+        starting_lineup = {'p{:02}'.format(idx): idx for idx in range(self.pipeline.num_player)}
+        game_result = {'vis_score': 1, 'home_score': 2, 'result': 1}
+        players = {'p00': np.arange(1, self.pipeline.num_feature + 1, dtype=float)}
+        game_data = {
+            'ANA202204070': (players, game_result, starting_lineup),
+            'ANA202204080': ({}, game_result, starting_lineup),
+        }
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            con = sqlite3.connect(os.path.join(temp_dir, 'types.db'))
+            self.pipeline.load(con, game_data)
+            columns = ', '.join('typeof({})'.format(column) for column in self.pipeline.feature_header)
+            types = con.execute('SELECT {} FROM game ORDER BY game_id'.format(columns)).fetchall()[1]
+            con.close()
+
+        # counts are stored as integers and rates as reals, players not seen yet as integer zeros
+        num_feature = self.pipeline.num_feature
+        expected = ['integer' if is_count else 'real' for is_count in self.pipeline.integer_features[:num_feature]]
+        expected += ['integer'] * (self.pipeline.num_aggregate_feature - num_feature)
+        self.assertEqual(expected, list(types))
+        self.assertIn('real', types)
+
+    def test_export(self):
+        starting_lineup = {'p{:02}'.format(idx): idx for idx in range(self.pipeline.num_player)}
+        players = {'p00': np.arange(1, self.pipeline.num_feature + 1, dtype=float) / 3}
+        # games are stored in date order but exported in game id order
+        game_data = {
+            'BOS202204070': (players, {'vis_score': 1, 'home_score': 2, 'result': 1}, starting_lineup),
+            'ANA202204080': ({}, {'vis_score': 3, 'home_score': 2, 'result': 0}, starting_lineup),
+        }
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            exported = {}
+            for blob_features in (False, True):
+                pipe = Pipeline(blob_features=blob_features)
+                db_file = os.path.join(temp_dir, 'export_{}.db'.format(blob_features))
+                con = sqlite3.connect(db_file)
+                pipe.load(con, game_data)
+                pipe.publish(con)
+                array_path = pipe.array_path(db_file)
+                self.assertEqual(os.path.join(temp_dir, 'export_{}'.format(blob_features)), array_path)
+                pipe.export(con, array_path)
+                mu, std = pipe.scaler.calculate_statistics()
+                con.close()
+
+                features = np.load(os.path.join(array_path, 'features.npy'), mmap_mode='r')
+                self.assertEqual((2, pipe.num_player, pipe.num_feature), features.shape)
+                self.assertEqual(np.float32, features.dtype)
+                self.assertEqual([0, 1], np.load(os.path.join(array_path, 'labels.npy')).tolist())
+                game_ids = np.load(os.path.join(array_path, 'game_ids.npy'))
+                self.assertEqual(['ANA202204080', 'BOS202204070'], game_ids.tolist())
+                datetimes = np.load(os.path.join(array_path, 'datetimes.npy'))
+                self.assertEqual(np.datetime64('2022-04-08T00:00:00'), datetimes[0])
+
+                # the later game has the earlier game's career features, normalized
+                x = features[0].flatten()[:pipe.num_feature]
+                career = np.float32(pipe.prefix_sum.gather({'p00': 0})[0])
+                expected = (career - np.float32(mu[:pipe.num_feature])) / np.float32(std[:pipe.num_feature])
+                np.testing.assert_allclose(expected, x, rtol=1e-6)
+                self.assertTrue(x.any())
+                exported[blob_features] = np.array(features)
+                del features
+
+            np.testing.assert_array_equal(exported[False], exported[True])
+
+    def test_process_checkpoint(self):
+        full_file = 'test_process_full.db'
+        crash_file = 'test_process_crash.db'
+        for db_file in (full_file, crash_file):
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+        self.pipeline.db_file = full_file
+        self.pipeline.lo_year, self.pipeline.hi_year = 2021, 2022
+        self.pipeline.process()
+
+        # crash while loading 2022, after 2021 was checkpointed
+        crash = Pipeline()
+        crash.db_file = crash_file
+        crash.lo_year, crash.hi_year = 2021, 2022
+        load = crash.load
+
+        def crash_load(connection, game_data, year=None, fit_scaler=True):
+            if year == 2022:
+                raise RuntimeError('crash')
+            load(connection, game_data, year, fit_scaler)
+        crash.load = crash_load
+        with self.assertRaises(RuntimeError):
+            crash.process()
+
+        resumed = Pipeline()
+        resumed.db_file = crash_file
+        resumed.lo_year, resumed.hi_year = 2021, 2022
+        resumed.process(resume=True)
+
+        # bit identical to a run that never crashed
+        full_con = sqlite3.connect(full_file)
+        crash_con = sqlite3.connect(crash_file)
+        for cmd in ('SELECT * FROM game ORDER BY rowid', 'SELECT * FROM scaler ORDER BY id'):
+            expected = full_con.execute(cmd).fetchall()
+            actual = crash_con.execute(cmd).fetchall()
+            self.assertTrue(len(expected) > 0)
+            self.assertEqual(expected, actual)
+
+        # clean up
+        full_con.close()
+        crash_con.close()
+        for db_file in (full_file, crash_file):
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+    def test_load_season_checkpoint(self):
+        starting_lineup = {'p{:02}'.format(idx): idx for idx in range(self.pipeline.num_player)}
+        game_result = {'vis_score': 1, 'home_score': 2, 'result': 1}
+        game_data = {'ANA202004070': ({}, game_result, starting_lineup)}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.pipeline.splits = {'train': (2021, 2021), 'test': (2022, 2022)}
+            connections = {name: sqlite3.connect(os.path.join(temp_dir, '{}.db'.format(name)))
+                           for name in self.pipeline.splits}
+            # a season outside every split has no games to store, but is still a resume point
+            self.pipeline.load_season(connections, game_data, 2020)
+            self.assertFalse(self.pipeline.has_games(connections['train']))
+            self.assertEqual(2020, self.pipeline.saved_year(connections['train']))
+            self.assertIsNone(self.pipeline.saved_year(connections['test']))
+            for con in connections.values():
+                con.close()
+
+    def test_process_splits_checkpoint(self):
+        with tempfile.TemporaryDirectory() as full_path, tempfile.TemporaryDirectory() as crash_path:
+            splits = {'train': (2022, 2022)}
+            full = Pipeline()
+            full.data_path = full_path
+            full.lo_year, full.hi_year = 2021, 2022
+            full.splits = splits
+            full.process()
+
+            # crash while loading 2022, after 2021 outside every split was checkpointed
+            crash = Pipeline()
+            crash.data_path = crash_path
+            crash.lo_year, crash.hi_year = 2021, 2022
+            crash.splits = splits
+            load = crash.load
+
+            def crash_load(connection, game_data, year=None, fit_scaler=True):
+                if year == 2022:
+                    raise RuntimeError('crash')
+                load(connection, game_data, year, fit_scaler)
+            crash.load = crash_load
+            with self.assertRaises(RuntimeError):
+                crash.process()
+
+            resumed = Pipeline()
+            resumed.data_path = crash_path
+            resumed.lo_year, resumed.hi_year = 2021, 2022
+            resumed.splits = splits
+            con = sqlite3.connect(os.path.join(crash_path, 'train.db'))
+            self.assertEqual(2021, resumed.saved_year(con))
+            con.close()
+            resumed.process(resume=True)
+
+            # bit identical to a run that never crashed
+            full_con = sqlite3.connect(os.path.join(full_path, 'train.db'))
+            crash_con = sqlite3.connect(os.path.join(crash_path, 'train.db'))
+            for cmd in ('SELECT * FROM game ORDER BY rowid', 'SELECT * FROM scaler ORDER BY id'):
+                expected = full_con.execute(cmd).fetchall()
+                actual = crash_con.execute(cmd).fetchall()
+                self.assertTrue(len(expected) > 0)
+                self.assertEqual(expected, actual)
+            full_con.close()
+            crash_con.close()
+
+    def test_split_for(self):
+        self.assertIsNone(self.pipeline.split_for(2022))
+        self.assertEqual({None: self.pipeline.db_file}, self.pipeline.split_files())
+
+        self.pipeline.splits = {'train': (1914, 2020), 'valid': (2021, 2021), 'test': (2022, 2022)}
+        self.assertEqual('train', self.pipeline.split_for(1914))
+        self.assertEqual('train', self.pipeline.split_for(2020))
+        self.assertEqual('valid', self.pipeline.split_for(2021))
+        self.assertEqual('test', self.pipeline.split_for(2022))
+        self.assertIsNone(self.pipeline.split_for(2023))
+        self.assertEqual(['train', 'valid', 'test'], list(self.pipeline.split_files()))
+
+    def test_process_splits(self):
+        single_file = 'test_process_single.db'
+        if os.path.exists(single_file):
+            os.remove(single_file)
+
+        self.pipeline.db_file = single_file
+        self.pipeline.lo_year, self.pipeline.hi_year = 2021, 2022
+        self.pipeline.process()
+
+        with tempfile.TemporaryDirectory() as split_path:
+            split = Pipeline()
+            split.data_path = split_path
+            split.lo_year, split.hi_year = 2021, 2022
+            split.splits = {'train': (2021, 2021), 'test': (2022, 2022)}
+            split.process()
+
+            # each split holds its own seasons with the career features of a single pass
+            single_con = sqlite3.connect(single_file)
+            cmd = "SELECT * FROM game WHERE substr(game_id, 4, 4)=? ORDER BY game_id"
+            full_scaler = single_con.execute('SELECT * FROM scaler WHERE id=0').fetchone()[2:]
+            scalers = []
+            for name, year in (('train', '2021'), ('test', '2022')):
+                split_con = sqlite3.connect(os.path.join(split_path, '{}.db'.format(name)))
+                expected = single_con.execute(cmd, (year,)).fetchall()
+                actual = split_con.execute('SELECT * FROM game ORDER BY game_id').fetchall()
+                self.assertTrue(len(expected) > 0)
+                self.assertEqual(expected, actual)
+                scalers.append(split_con.execute('SELECT * FROM scaler ORDER BY id').fetchall())
+                split_con.close()
+            single_con.close()
+
+            # both splits are normalized with statistics fitted on train only
+            self.assertEqual(scalers[0], scalers[1])
+            self.assertFalse(np.allclose(scalers[0][0][2:], full_scaler))
+
+        # clean up
+        if os.path.exists(single_file):
+            os.remove(single_file)
+
+    def test_process_resume(self):
+        full_file = 'test_process_full.db'
+        resume_file = 'test_process_resume.db'
+        for db_file in (full_file, resume_file):
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+        self.pipeline.db_file = full_file
+        self.pipeline.lo_year, self.pipeline.hi_year = 2021, 2022
+        self.pipeline.process()
+
+        # process 2021, then resume with 2022 appended
+        first = Pipeline()
+        first.db_file = resume_file
+        first.lo_year = first.hi_year = 2021
+        first.process()
+
+        resumed = Pipeline()
+        resumed.db_file = resume_file
+        resumed.lo_year, resumed.hi_year = 2021, 2022
+        resumed.process(resume=True)
+
+        full_con = sqlite3.connect(full_file)
+        resume_con = sqlite3.connect(resume_file)
+        for cmd in ('SELECT * FROM game ORDER BY game_id', 'SELECT * FROM scaler ORDER BY id'):
+            expected = full_con.execute(cmd).fetchall()
+            actual = resume_con.execute(cmd).fetchall()
+            self.assertTrue(len(expected) > 0)
+            self.assertEqual(expected, actual)
+
+        # clean up
+        full_con.close()
+        resume_con.close()
+        for db_file in (full_file, resume_file):
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,10 @@
 import unittest
 import sqlite3
-from baseball.player import Play, Batting, BaseRunning, Fielding, Pitching, Player
+import csv
+import pickle
+from baseball.player import (Play, ParsedPlay, PlayCache, Batting, BaseRunning, Fielding, Pitching, Player,
+                             role_columns, parse_players)
+from benchmarks.reference_play import Play as ReferencePlay
 
 
 class TestPlay(unittest.TestCase):
@@ -778,6 +782,113 @@ class TestPlay(unittest.TestCase):
         self.assertEqual(3, self.play.earned_run)
 
 
+class TestParsedPlay(unittest.TestCase):
+
+    def setUp(self):
+        self.play = Play()
+
+    def test_freeze(self):
+        self.play.parse('54(1)/FO/G5.3-H;B-1', '3-H;0-1')
+        parsed_play = self.play.freeze()
+        self.assertTrue(isinstance(parsed_play, ParsedPlay))
+        for name in ParsedPlay._fields:
+            expected = getattr(self.play, name)
+            if isinstance(expected, list):
+                self.assertEqual(len(expected), len(getattr(parsed_play, name)))
+                self.assertEqual(expected, list(getattr(parsed_play, name)))
+            else:
+                self.assertEqual(expected, getattr(parsed_play, name))
+
+    def test_record_unchanged_by_next_parse(self):
+        self.play.parse('64(1)3/GDP/G6')
+        first = self.play.freeze()
+        self.play.parse('K')
+        self.assertEqual('43', first.put_out)
+        self.assertEqual('6', first.assist)
+        self.assertEqual(['2'], self.play.put_out)
+        self.assertEqual([], self.play.assist)
+
+
+class TestPlayEquivalence(unittest.TestCase):
+
+    def setUp(self):
+        self.play = Play()
+        self.reference = ReferencePlay()
+        self.season_file = '../data/seasons/2022rs.csv'
+
+    def test_season_2022(self):
+        # tokenized parser must match the original find() based parser on every event of a season
+        with open(self.season_file) as csv_file:
+            reader = csv.DictReader(csv_file)
+            for event in reader:
+                the_play = event['theplay']
+                base_running = event['baserunning']
+                self.reference.parse(the_play, base_running)
+                self.play.parse(the_play, base_running)
+                for name, expected in vars(self.reference).items():
+                    self.assertEqual(expected, getattr(self.play, name),
+                                     msg='{} {} {}'.format(name, the_play, base_running))
+
+
+class TestPlayCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = PlayCache(max_size=2)
+        self.play = Play()
+
+    def test_parsed_play(self):
+        self.play.parse('64(1)3/GDP/G6', '3-H')
+        expected = self.play.freeze()
+        parsed_play = self.cache.parse('64(1)3/GDP/G6', '3-H')
+        self.assertTrue(isinstance(parsed_play, ParsedPlay))
+        self.assertEqual(expected, parsed_play)
+
+        self.assertEqual(2, parsed_play.num_out)
+        self.assertEqual('43', parsed_play.put_out)
+        self.assertEqual('6', parsed_play.assist)
+        self.assertEqual('3', parsed_play.score)
+        self.assertEqual(1, parsed_play.ground_double_play)
+
+    def test_immutable(self):
+        parsed_play = self.cache.parse('S8', '1-3')
+        with self.assertRaises(AttributeError):
+            parsed_play.single = 0
+        self.assertEqual(('1-3',), parsed_play.advance)
+
+    def test_pickle(self):
+        parsed_play = self.cache.parse('K+CS2(26)', '')
+        self.assertEqual(parsed_play, pickle.loads(pickle.dumps(parsed_play)))
+
+    def test_hit_rate(self):
+        self.assertEqual(0.0, self.cache.hit_rate())
+
+        first = self.cache.parse('K')
+        second = self.cache.parse('K')
+        self.assertIs(first, second)
+        self.cache.parse('W')
+        self.cache.parse('W')
+
+        self.assertEqual(2, self.cache.hit)
+        self.assertEqual(2, self.cache.miss)
+        self.assertAlmostEqual(0.5, self.cache.hit_rate())
+
+        self.cache.reset()
+        self.assertEqual(0, self.cache.hit)
+        self.assertEqual(0, self.cache.miss)
+        self.assertFalse(self.cache.cache)
+
+    def test_evict_least_recently_used(self):
+        self.cache.parse('K')
+        self.cache.parse('W')
+        self.cache.parse('K')  # W is now least recently used
+        self.cache.parse('S8')
+
+        self.assertEqual(2, len(self.cache.cache))
+        self.assertIn(('K', ''), self.cache.cache)
+        self.assertIn(('S8', ''), self.cache.cache)
+        self.assertNotIn(('W', ''), self.cache.cache)
+
+
 class TestBatting(unittest.TestCase):
 
     def setUp(self):
@@ -1457,6 +1568,114 @@ class TestPitcing(unittest.TestCase):
         self.assertEqual(2, self.pitching.pick_off)
 
 
+class TestPlayerParseAll(unittest.TestCase):
+
+    def setUp(self):
+        self.con = sqlite3.connect(':memory:')
+        self.cur = self.con.cursor()
+        columns = ['eventID', 'gameID', 'theyear', 'theplay', 'baserunning'] + list(role_columns)
+        self.cur.execute('CREATE TABLE event({})'.format(', '.join(columns)))
+
+        fielders = ['p1', 'c1', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9']
+        events = [
+            # batter singles, then steals second as a runner
+            ('1', 'ANA202204070', '2022', 'S8', '', 'b1', '', '', '', *fielders),
+            ('2', 'ANA202204070', '2022', 'SB2', '', 'b2', 'b1', '', '', *fielders),
+            # pitcher fields a ground ball back to the mound
+            ('3', 'ANA202204070', '2022', '13', '', 'b2', '', 'b1', '', *fielders),
+            ('4', 'ANA202205080', '2022', 'K', '', 'b1', '', '', '', *fielders),
+            ('5', 'ANA202104070', '2021', 'HR', '', 'b1', '', '', '', *fielders),
+        ]
+        self.cur.executemany('INSERT INTO event VALUES({})'.format(', '.join(['?'] * len(columns))), events)
+
+    def check_parse_all(self, player_id, **kwargs):
+        expected = Player(player_id, self.cur, **kwargs)
+        expected.parse_batting()
+        expected.parse_base_running()
+        expected.parse_fielding()
+        expected.parse_pitching()
+
+        actual = Player(player_id, self.cur, **kwargs)
+        actual.parse_all()
+        self.assertEqual(expected.features(), actual.features())
+        return actual
+
+    def test_batter_and_runner(self):
+        p = self.check_parse_all('b1', year='2022')
+        self.assertEqual(1, p.batting.single)
+        self.assertEqual(1, p.batting.strike_out)
+        self.assertEqual(1, p.base_running.steal_second)
+
+        p = self.check_parse_all('b1')
+        self.assertEqual(1, p.batting.home_run)
+
+        p = self.check_parse_all('b1', year='2022', month='04')
+        self.assertEqual(0, p.batting.strike_out)
+
+    def test_pitcher(self):
+        p = self.check_parse_all('p1', year='2022')
+        self.assertEqual(1, p.fielding.assist)
+        self.assertEqual(1, p.pitching.strike_out)
+
+    def test_fielder(self):
+        p = self.check_parse_all('f3')
+        self.assertEqual(1, p.fielding.put_out)
+
+    def test_unknown_player(self):
+        p = self.check_parse_all('nobody')
+        self.assertEqual(Player('nobody').features(), p.features())
+
+    def test_quoted_player_id(self):
+        # ids are bound as parameters, so quotes cannot change the query
+        p = self.check_parse_all("b1' OR '1'='1", year='2022')
+        self.assertEqual(Player('nobody').features(), p.features())
+        p.parse_batting()
+        self.assertEqual(0, p.batting.at_bat)
+
+    def test_integer_year(self):
+        expected = self.check_parse_all('b1', year='2022')
+        actual = self.check_parse_all('b1', year=2022)
+        self.assertEqual(expected.features(), actual.features())
+
+    def test_game_filters(self):
+        p = self.check_parse_all('b1', year='2022', month='04', day='07', game='0')
+        self.assertEqual(1, p.batting.single)
+        self.assertEqual(0, p.batting.strike_out)
+
+        p = self.check_parse_all('b1', year='2022', month='05')
+        self.assertEqual(0, p.batting.single)
+        self.assertEqual(1, p.batting.strike_out)
+
+        # a game that was never played
+        p = self.check_parse_all('b1', year='2022', month='04', day='07', game='1')
+        self.assertEqual(Player('nobody').features(), p.features())
+
+        players = parse_players(self.cur, year='2022', month='05', player_ids=['b1', 'p1'])
+        self.assertEqual(1, players['b1'].batting.strike_out)
+        self.assertEqual(0, players['b1'].batting.single)
+        self.assertEqual(1, players['p1'].pitching.strike_out)
+        self.assertEqual(0, players['p1'].fielding.assist)
+
+    def test_parse_players(self):
+        for year in ('2022', None):
+            players = parse_players(self.cur, year=year)
+            self.assertEqual({'b1', 'b2', 'p1', 'c1', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9'}, set(players))
+            for player_id, player in players.items():
+                expected = Player(player_id, self.cur, year=year)
+                expected.parse_all()
+                self.assertEqual(expected.features(), player.features())
+
+        # only the requested players, including ones with no events
+        players = parse_players(self.cur, year='2022', player_ids=['b1', 'p1', 'nobody'])
+        self.assertEqual({'b1', 'p1', 'nobody'}, set(players))
+        self.assertEqual(1, players['b1'].base_running.steal_second)
+        self.assertEqual(1, players['p1'].pitching.strike_out)
+        self.assertEqual(Player('nobody').features(), players['nobody'].features())
+
+    def tearDown(self):
+        self.con.close()
+
+
 class TestPlayer(unittest.TestCase):
 
     def setUp(self):
@@ -1471,10 +1690,25 @@ class TestPlayer(unittest.TestCase):
         p.parse_base_running()
         p.parse_fielding()
         p.parse_pitching()
+        p.parse_all()
 
         # success if we got here
         self.assertTrue(True)
 
+    def test_parse_all(self):
+        for player_id, kwargs in (('bettm001', {'year': '2022', 'month': '04'}),
+                                  ('swand001', {'year': '2022'}),
+                                  ('alcas001', {'year': '2022'})):
+            expected = Player(player_id, self.cur, **kwargs)
+            expected.parse_batting()
+            expected.parse_base_running()
+            expected.parse_fielding()
+            expected.parse_pitching()
+
+            actual = Player(player_id, self.cur, **kwargs)
+            actual.parse_all()
+            self.assertEqual(expected.features(), actual.features())
+
     # baseball almanac doesn't seem to record hit by pitch, so some numbers are off
     # https://www.baseball-almanac.com/players/hittinglogs.php?p=bettsmo01&y=2022
     #                       AB	R	H	2B	3B	HR	RBI	BB	IBB	K	HBP	SH	SF	AVG     OBP	    SLG
@@ -1,8 +1,11 @@
 import unittest
 import torch
 import os
+import pickle
+import shutil
+import sqlite3
 from baseball.pipeline import Pipeline
-from baseball.utils import BaseballDataset
+from baseball.utils import BaseballDataset, ArrayDataset, load_data
 
 
 class TestBaseballDataset(unittest.TestCase):
@@ -34,6 +37,17 @@ class TestBaseballDataset(unittest.TestCase):
         valid_game_results = [0, 1]
         self.assertIn(y, valid_game_results)
 
+    def test_rowids(self):
+        # games are indexed in game id order by integer rowid
+        self.assertEqual(torch.int64, torch.from_numpy(self.dataset.rowids).dtype)
+        self.assertEqual(len(self.dataset), len(self.dataset.rowids))
+        con = sqlite3.connect(self.db_file)
+        expected = [row[0] for row in con.execute('SELECT game_id FROM game ORDER BY game_id')]
+        con.close()
+        self.assertEqual(expected, list(self.dataset.game_list))
+        self.assertEqual(expected[-3:], self.dataset.game_list[-3:])
+        self.assertEqual(expected[-1], self.dataset.game_list[-1])
+
     def test_get_item(self):
         data = []
         for idx in range(len(self.dataset)):
@@ -77,6 +91,20 @@ class TestBaseballDataset(unittest.TestCase):
             else:
                 self.assertAlmostEqual(0.0, float(actual_std[idx]), delta=tol)
 
+    def test_get_items_order(self):
+        # shuffled, with a repeated game
+        index_list = torch.randperm(len(self.dataset))[:64].tolist() + [5, 5]
+        items = self.dataset.__getitems__(index_list)
+        self.assertEqual(len(index_list), len(items))
+        for game_index, (x, y) in zip(index_list, items):
+            expected_x, expected_y = self.dataset[game_index]
+            self.assertEqual(expected_y, y)
+            self.assertTrue(torch.equal(expected_x, x))
+
+        features, labels = self.dataset.fetch_batch(index_list)
+        self.assertEqual((len(index_list), self.dataset.num_player, self.dataset.num_feature), tuple(features.shape))
+        self.assertEqual([y for _, y in items], labels.tolist())
+
     def test_fetch_all_data(self):
         features, labels = self.dataset.fetch_all_data()
         data = features.flatten(1, -1)
@@ -92,6 +120,80 @@ class TestBaseballDataset(unittest.TestCase):
             else:
                 self.assertAlmostEqual(0.0, float(actual_std[idx]), delta=tol)
 
+    def test_blob_features(self):
+        blob_file = 'test_2022_blob.db'
+        if os.path.exists(blob_file):
+            os.remove(blob_file)
+
+        p = Pipeline(blob_features=True)
+        p.db_file = blob_file
+        p.lo_year = p.hi_year = 2022
+        p.process()
+        blob_dataset = BaseballDataset(blob_file)
+
+        # packed features decode to the same normalized tensors as a column per feature
+        self.assertTrue(blob_dataset.blob_features)
+        self.assertEqual(self.dataset.game_list, blob_dataset.game_list)
+        for game_index in (0, len(self.dataset) // 2, len(self.dataset) - 1):
+            x, y = self.dataset[game_index]
+            blob_x, blob_y = blob_dataset[game_index]
+            self.assertEqual(y, blob_y)
+            self.assertEqual(x.shape, blob_x.shape)
+            self.assertTrue(torch.equal(x, blob_x))
+
+        del blob_dataset
+        os.remove(blob_file)
+
+    def test_array_dataset(self):
+        array_path = 'test_2022_arrays'
+        p = Pipeline()
+        con = sqlite3.connect(self.db_file)
+        p.export(con, array_path)
+        con.close()
+        array_dataset = ArrayDataset(array_path)
+
+        # exported games line up with the database games and serve the same normalized features
+        self.assertEqual(len(self.dataset), len(array_dataset))
+        self.assertEqual(self.dataset.game_list, array_dataset.game_list.tolist())
+        index_list = [len(self.dataset) - 1, 0, len(self.dataset) // 2]
+        items = array_dataset.__getitems__(index_list)
+        for game_index, (batch_x, batch_y) in zip(index_list, items):
+            x, y = self.dataset[game_index]
+            array_x, array_y = array_dataset[game_index]
+            self.assertEqual(y, array_y)
+            self.assertEqual(y, batch_y)
+            self.assertTrue(torch.equal(x, array_x))
+            self.assertTrue(torch.equal(x, batch_x))
+
+        # pickled copies for data loader workers map the file again rather than carrying the features
+        array_dataset.mapped_features()
+        copy = pickle.loads(pickle.dumps(array_dataset))
+        self.assertIsNone(copy.features)
+        self.assertTrue(torch.equal(array_dataset[0][0], copy[0][0]))
+
+        del array_dataset, copy
+        shutil.rmtree(array_path)
+
+    def test_connections(self):
+        # connections are opened on first use, read only
+        self.assertIsNone(self.dataset.connection)
+        x, y = self.dataset[0]
+        self.assertEqual(os.getpid(), self.dataset.pid)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.dataset.connect().execute('CREATE TABLE foo(x)')
+
+        # pickled copies for data loader workers open their own connection
+        copy = pickle.loads(pickle.dumps(self.dataset))
+        self.assertIsNone(copy.connection)
+        self.assertTrue(torch.equal(x, copy[0][0]))
+        self.assertIsNot(self.dataset.connection, copy.connection)
+
+        batch_size = 64
+        for features, labels in load_data(self.db_file, num_workers=2, batch_size=batch_size):
+            self.assertEqual((batch_size, self.dataset.num_player, self.dataset.num_feature), tuple(features.shape))
+            self.assertEqual(batch_size, len(labels))
+            break
+
     def tearDown(self):
         if os.path.exists(self.db_file):
             os.remove(self.db_file)